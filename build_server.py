@@ -1,12 +1,17 @@
 import subprocess
+import hashlib
 import os
 import shutil
 import sys
+import tempfile
 import venv
 
 BUILD_ENV_DIR = "build_venv"
 REQUIREMENTS_FILE = "requirements.txt"
 SPEC_FILE = "server.spec"
+REQ_HASH_FILE = os.path.join(BUILD_ENV_DIR, ".req_hash")
+VENV_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "crickcoder")
+PIP_BASE = ["python", "-m", "pip", "install", "--progress-bar", "off", "--no-input", "--disable-pip-version-check"]
 
 def run_in_venv(args, cwd=None):
     """Runs a command inside the virtual environment."""
@@ -17,6 +22,11 @@ def run_in_venv(args, cwd=None):
         python_exe = os.path.join(BUILD_ENV_DIR, "bin", "python")
         pip_exe = os.path.join(BUILD_ENV_DIR, "bin", "pip")
 
+    # Skip pip's network version check and interpreter warnings on every call
+    env = dict(os.environ)
+    env["PIP_DISABLE_PIP_VERSION_CHECK"] = "1"
+    env["PIP_NO_PYTHON_VERSION_WARNING"] = "1"
+
     # If the command is 'python' or 'pip', replace with full path
     if args[0] == "python":
         args[0] = python_exe
@@ -28,28 +38,99 @@ def run_in_venv(args, cwd=None):
             args[0] = os.path.join(BUILD_ENV_DIR, "Scripts", "pyinstaller.exe")
         else:
             args[0] = os.path.join(BUILD_ENV_DIR, "bin", "pyinstaller")
+        # Private config/cache dir so concurrent builds on the same host don't corrupt each other
+        env["PYINSTALLER_CONFIG_DIR"] = os.path.join(tempfile.gettempdir(), f"pyi-{os.getpid()}")
 
     print(f"[EXEC] Executing in venv: {' '.join(args)}")
-    subprocess.check_call(args, cwd=cwd)
+    subprocess.check_call(args, cwd=cwd, env=env)
+
+def pip_install(*pkgs):
+    """Runs a quiet, non-interactive pip install inside the venv."""
+    run_in_venv(PIP_BASE + list(pkgs))
+
+def requirements_hash():
+    """Returns the SHA256 of requirements.txt."""
+    with open(REQUIREMENTS_FILE, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def deps_up_to_date(req_hash):
+    """True if the venv was populated from the same requirements.txt and PyInstaller is present."""
+    if sys.platform == "win32":
+        pyinstaller_exe = os.path.join(BUILD_ENV_DIR, "Scripts", "pyinstaller.exe")
+    else:
+        pyinstaller_exe = os.path.join(BUILD_ENV_DIR, "bin", "pyinstaller")
+
+    if not os.path.exists(REQ_HASH_FILE) or not os.path.exists(pyinstaller_exe):
+        return False
+    with open(REQ_HASH_FILE, "r") as f:
+        return f.read().strip() == req_hash
+
+def save_venv_cache(cache_path):
+    """Packs the populated venv into a zstd tarball so clean builds can skip pip entirely."""
+    if os.path.exists(cache_path):
+        return
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    try:
+        print(f"[CACHE] Saving virtual environment to {cache_path}...")
+        subprocess.check_call(["tar", "--zstd", "-cf", tmp_path, BUILD_ENV_DIR])
+        os.replace(tmp_path, cache_path)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"[WARN] Could not cache virtual environment: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def restore_venv_cache(cache_path):
+    """Extracts a cached venv tarball. Returns False (and cleans up) on failure."""
+    try:
+        subprocess.check_call(["tar", "--zstd", "-xf", cache_path])
+        return True
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"[WARN] Could not restore cached virtual environment: {e}")
+        shutil.rmtree(BUILD_ENV_DIR, ignore_errors=True)
+        return False
+
+def install_dependencies():
+    """Installs requirements + PyInstaller in a single resolver pass (uv if available)."""
+    if shutil.which("uv"):
+        # uv resolves and installs in parallel; point it at the venv interpreter
+        if sys.platform == "win32":
+            python_exe = os.path.join(BUILD_ENV_DIR, "Scripts", "python.exe")
+        else:
+            python_exe = os.path.join(BUILD_ENV_DIR, "bin", "python")
+        print(f"[EXEC] Executing with uv: uv pip install -r {REQUIREMENTS_FILE} pyinstaller")
+        subprocess.check_call(["uv", "pip", "install", "--python", python_exe, "-r", REQUIREMENTS_FILE, "pyinstaller"])
+    else:
+        # Upgrade pip and install everything in one invocation (one interpreter start, one resolve)
+        pip_install("--upgrade", "pip", "pyinstaller", "-r", REQUIREMENTS_FILE)
 
 def main():
     print("[START] Starting CLEAN Build Process...")
 
-    # 1. Create Venv
+    req_hash = requirements_hash()
+    # venvs embed absolute paths, so the cache key includes the checkout location
+    location_hash = hashlib.sha256(os.path.abspath(BUILD_ENV_DIR).encode("utf-8")).hexdigest()[:8]
+    cache_path = os.path.join(VENV_CACHE_DIR, f"{BUILD_ENV_DIR}-{location_hash}-{req_hash[:16]}.tar.zst")
+
+    # 1. Create Venv (restore from local cache if a matching archive exists)
     if not os.path.exists(BUILD_ENV_DIR):
-        print(f"[INIT] Creating virtual environment: {BUILD_ENV_DIR}...")
-        venv.create(BUILD_ENV_DIR, with_pip=True)
+        if os.path.exists(cache_path) and restore_venv_cache(cache_path):
+            print(f"[INIT] Restored virtual environment from cache: {cache_path}")
+        else:
+            print(f"[INIT] Creating virtual environment: {BUILD_ENV_DIR}...")
+            venv.create(BUILD_ENV_DIR, with_pip=True)
     else:
         print(f"[INIT] Virtual environment {BUILD_ENV_DIR} exists.")
 
-    # 2. Install Dependencies
-    print("[DEPS] Installing/Updating dependencies from requirements_build.txt...")
-    # Upgrade pip first
-    run_in_venv(["python", "-m", "pip", "install", "--upgrade", "pip"])
-    run_in_venv(["pip", "install", "-r", REQUIREMENTS_FILE])
-    
-    # Ensure PyInstaller is installed (it's in requirements, but double check)
-    run_in_venv(["pip", "install", "pyinstaller"])
+    # 2. Install Dependencies (skipped if requirements.txt is unchanged since last install)
+    if deps_up_to_date(req_hash):
+        print("[DEPS] requirements.txt unchanged. Skipping dependency install.")
+    else:
+        print("[DEPS] Installing/Updating dependencies from requirements_build.txt...")
+        install_dependencies()
+        with open(REQ_HASH_FILE, "w") as f:
+            f.write(req_hash)
+        save_venv_cache(cache_path)
 
     # 3. Clean Checks
     if os.path.exists("server-dist"):
@@ -87,21 +168,59 @@ def patch_pyinstaller():
         print(f"[WARN] Could not find util.py at {util_path}. Patching skipped.")
         return
 
-    with open(util_path, "r") as f:
-        content = f.read()
+    # Already patched (and util.py not replaced since): skip reading the file.
+    # The marker stores util.py's (size, mtime_ns, inode): mtimes alone miss reinstalls, since uv
+    # hardlinks files from its cache with their original (older) mtimes.
+    marker_path = util_path + ".crickpatched"
+    def util_signature():
+        st = os.stat(util_path)
+        return f"{st.st_size} {st.st_mtime_ns} {st.st_ino}"
+    try:
+        with open(marker_path, "r") as f:
+            if f.read().strip() == util_signature():
+                print("[OK] PyInstaller already patched.")
+                return
+    except OSError:
+        pass
 
     # The line to patch
     target = '    yield from (i for i in dis.get_instructions(code_object) if i.opname != "EXTENDED_ARG")'
     replacement = "    try:\n        yield from (i for i in dis.get_instructions(code_object) if i.opname != 'EXTENDED_ARG')\n    except IndexError:\n        pass"
 
-    if target in content:
-        new_content = content.replace(target, replacement)
-        with open(util_path, "w") as f:
-            f.write(new_content)
-        print("[OK] PyInstaller patched successfully.")
-    else:
-        print("[WARN] Target line not found in util.py. Maybe version differs? Patching skipped.")
-
+    # Line left by a previous run of this patch (builds from before the marker existed)
+    patched_line = replacement.splitlines()[1]
+
+    # Stream line by line into a sibling temp file, then atomically swap it in
+    patched = False
+    already_patched = False
+    tmp_path = None
+    try:
+        with open(util_path, "r") as src, tempfile.NamedTemporaryFile("w", dir=os.path.dirname(util_path), delete=False) as dst:
+            tmp_path = dst.name
+            for line in src:
+                stripped = line.rstrip("\r\n")
+                if stripped == target:
+                    dst.write(replacement + line[len(stripped):])
+                    patched = True
+                else:
+                    already_patched = already_patched or stripped == patched_line
+                    dst.write(line)
+
+        if patched:
+            shutil.copymode(util_path, tmp_path)
+            os.replace(tmp_path, util_path)
+            print("[OK] PyInstaller patched successfully.")
+        elif already_patched:
+            print("[OK] PyInstaller already patched.")
+        else:
+            print("[WARN] Target line not found in util.py. Maybe version differs? Patching skipped.")
+            return
+        with open(marker_path, "w") as f:
+            f.write(util_signature())
+    finally:
+        # Temp file not swapped in (nothing to patch, or an error mid-copy): don't leave it in site-packages
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 if __name__ == "__main__":
     main()
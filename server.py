@@ -1,32 +1,36 @@
 import logging
 import uvicorn
 import datetime
+import time
 import os
 import shutil
 import asyncio
-import json
-import lancedb
+import tempfile
+import orjson
 
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from uuid import uuid4
 from typing import Optional, List, Dict, Any
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse, ORJSONResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 # --- Local Imports ---
 from src.models import ChatRequest, ContinueRequest, LLMSettings
 from src.core.runtime.manager import VibingManager
+from src.agents.factory import invalidate_agents
 from src.core.runtime.streamer import event_stream_generator
 from src.core.runtime.monitor import codebase_registry
 from pydantic import BaseModel
 from src.core.storage.storage import generate_session_id, list_sessions_with_summary, delete_session, get_session_with_runs
 from src.core.indexing.template_indexer import TemplateIndexer
-from src.core.runtime.server_utils import transform_runs_to_messages, normalize_path
+from src.core.runtime.server_utils import messages_json, normalize_path, resolve_in_root, read_text, read_bytes, decode_text, write_text_atomic, unified_diff_text
 from src.core.runtime.shadow_workspace import ShadowWorkspace
-import difflib
+from src.core.storage.lance_connections import get_lancedb_connection
 
 # --- Logging Setup ---
 import sys
@@ -48,15 +52,38 @@ SERVER_ROOT = os.path.dirname(os.path.abspath(__file__))
 
 # --- GLOBAL USER ROOT (.crickcoder) ---
 GLOBAL_CRICK_DIR = os.path.join(os.path.expanduser("~"), ".crickcoder")
+GLOBAL_PUBLIC_DIR = os.path.join(GLOBAL_CRICK_DIR, "public")
+GLOBAL_PUBLIC_TEMPLATES_DIR = os.path.join(GLOBAL_PUBLIC_DIR, "templates")
+GLOBAL_TEMPLATES_DB_PATH = os.path.join(GLOBAL_CRICK_DIR, "knowledge_base", "templates_db")
 
 # --- Bootstrap Function ---
+_FICLONE = 0x40049409  # linux/fs.h: share extents between two files (btrfs, xfs, ...)
+
+def _clone_file(src: str, dst: str, *, follow_symlinks: bool = True) -> str:
+    """copy2 replacement: reflinks the file where the filesystem supports it, plain copy otherwise."""
+    if sys.platform.startswith("linux"):
+        try:
+            import fcntl
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst, follow_symlinks=follow_symlinks)
+            return dst
+        except OSError:
+            pass
+    # copyfile already uses clonefile/sendfile where the platform offers them
+    return shutil.copy2(src, dst, follow_symlinks=follow_symlinks)
+
+def _fast_copytree(src: str, dst: str, **kwargs) -> str:
+    """copytree that seeds files via copy-on-write clones instead of byte copies."""
+    return shutil.copytree(src, dst, copy_function=_clone_file, **kwargs)
+
 def bootstrap_environment():
     """Bootstraps the global user environment from bundled assets."""
     logger.info(f"Checking Global Environment at: {GLOBAL_CRICK_DIR}")
     
     # 1. Base Directories
-    global_public = os.path.join(GLOBAL_CRICK_DIR, "public", "templates")
-    global_kb = os.path.join(GLOBAL_CRICK_DIR, "knowledge_base", "templates_db")
+    global_public = GLOBAL_PUBLIC_TEMPLATES_DIR
+    global_kb = GLOBAL_TEMPLATES_DB_PATH
     
     os.makedirs(global_public, exist_ok=True)
     os.makedirs(os.path.dirname(global_kb), exist_ok=True)
@@ -71,7 +98,7 @@ def bootstrap_environment():
             # But we don't want to overwrite USER changes? 
             # For now, let's just ensure they exist.
             if not os.listdir(global_public):
-                shutil.copytree(bundled_public, global_public, dirs_exist_ok=True)
+                _fast_copytree(bundled_public, global_public, dirs_exist_ok=True)
                 logger.info("[INIT] Bootstrapped Bundled Templates to Global Dir")
         except Exception as e:
             logger.error(f"Failed to bootstrap templates: {e}")
@@ -81,7 +108,7 @@ def bootstrap_environment():
     if os.path.exists(bundled_kb):
         if not os.path.exists(global_kb):
             try:
-                shutil.copytree(bundled_kb, global_kb)
+                _fast_copytree(bundled_kb, global_kb)
                 logger.info("[INIT] Bootstrapped Knowledge Base to Global Dir")
             except Exception as e:
                 logger.error(f"Failed to bootstrap Knowledge Base: {e}")
@@ -98,26 +125,29 @@ async def lifespan(app: FastAPI):
     await codebase_registry.shutdown()
 
 # --- FastAPI Setup ---
-app = FastAPI(title="Crick Coder API", lifespan=lifespan)
+app = FastAPI(title="Crick Coder API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], # Allow all origins for dev; restrict in prod
-    allow_credentials=True,
+    # No cookies/auth headers are used by the UI: without credentials Starlette can answer with a
+    # literal "*" instead of validating and echoing the Origin on every request.
+    allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
 # Ensure global public directory exists
-os.makedirs(os.path.join(GLOBAL_CRICK_DIR, "public"), exist_ok=True)
+os.makedirs(GLOBAL_PUBLIC_DIR, exist_ok=True)
 
 # Mount Static Files from GLOBAL PUBLIC to support user templates
-app.mount("/public", StaticFiles(directory=os.path.join(GLOBAL_CRICK_DIR, "public")), name="public")
+app.mount("/public", StaticFiles(directory=GLOBAL_PUBLIC_DIR), name="public")
 
 @app.get("/api/project/brain/{filename}")
-async def get_brain_file(filename: str, project_path: Optional[str] = Query(None), session_id: Optional[str] = Query(None)):
+async def get_brain_file(filename: str, project_path: Optional[str] = Query(None), session_id: Optional[str] = Query(None), raw: bool = Query(False)):
     """
     Returns the content of a file from the .crick/sessions/<session_id>/brain directory.
+    With raw=1 the file is streamed as text/plain (sendfile) instead of the JSON envelope.
     """
     try:
         if not project_path:
@@ -136,21 +166,27 @@ async def get_brain_file(filename: str, project_path: Optional[str] = Query(None
             logger.error(f"Project root not found: {project_root}")
             return {"content": "", "error": "Project path not found"}
 
-        brain_dir = os.path.join(project_root, ".crick", "sessions", session_id, "brain")
-        file_path = os.path.join(brain_dir, filename)
-        
+        file_path = resolve_in_root(project_root, ".crick", "sessions", session_id, "brain", filename)
+        if file_path is None:
+            return {"content": "", "error": "Access denied: File outside project root"}
 
+        if raw:
+            if not await asyncio.to_thread(os.path.isfile, file_path):
+                raise HTTPException(status_code=404, detail="File not found")
+            return FileResponse(file_path, media_type="text/plain; charset=utf-8")
         
-        if not os.path.exists(file_path):
+        # BLOCKING I/O: existence check + read in one thread hop
+        content = await asyncio.to_thread(read_text, file_path)
+        if content is None:
             # Proviamo a vedere se è un file nuovo e magari ancora non esiste
             logger.warning(f"File not found on disk: {file_path}")
             return {"content": "", "error": "File not found"}
-            
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-            logger.info(f"Read {len(content)} bytes from {filename}")
+
+        logger.info(f"Read {len(content)} bytes from {filename}")
         return {"content": content}
 
+    except HTTPException:
+        raise
     except Exception as e:
         return {"content": "", "error": str(e)}
 
@@ -167,17 +203,21 @@ async def clear_brain_task_file(
              raise HTTPException(status_code=400, detail="Missing project_path or session_id")
         
         project_root = normalize_path(project_path=project_path)
-        brain_dir = os.path.join(project_root, ".crick", "sessions", session_id, "brain")
+        brain_dir = resolve_in_root(project_root, ".crick", "sessions", session_id, "brain")
+        if brain_dir is None:
+            raise HTTPException(status_code=403, detail="Access denied: Path outside project root")
         file_path = os.path.join(brain_dir, "task.md")
         
         # Overwrite with empty default
         empty_content = "# Project Tasks\n\nNo active tasks."
         if os.path.exists(brain_dir): # Ensure dir exists
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(empty_content)
+            # BLOCKING I/O (fsync): atomic replace in a worker thread
+            await asyncio.to_thread(write_text_atomic, file_path, empty_content)
         
         return {"status": "success", "message": "Task list cleared."}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Clear Task Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -196,6 +236,8 @@ async def undo_run_changes(
 ):
     try:
         project_root = normalize_path(project_path=project_path)
+        if resolve_in_root(project_root, ".crick", "history", session_id, run_id) is None:
+            raise HTTPException(status_code=403, detail="Access denied: Path outside project root")
         
         target_files = body.files if body else None
 
@@ -213,6 +255,8 @@ async def undo_run_changes(
         else:
             return {"status": "ignored", "message": "No changes found to revert for this run."}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Undo Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -225,6 +269,8 @@ async def get_run_files(
 ):
     try:
         project_root = normalize_path(project_path=project_path)
+        if resolve_in_root(project_root, ".crick", "history", session_id, run_id) is None:
+            raise HTTPException(status_code=403, detail="Access denied: Path outside project root")
         
         files = ShadowWorkspace.get_instance().get_run_changes(
             project_root=project_root,
@@ -234,26 +280,31 @@ async def get_run_files(
         
         return {"files": files}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get Run Files Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/files/content")
-async def get_file_content(path: str = Query(...), project_path: str = Query(...)):
-    """Reads a file from the project safely."""
+async def get_file_content(path: str = Query(...), project_path: str = Query(...), raw: bool = Query(False)):
+    """Reads a file from the project safely. With raw=1 the bytes are sent as-is (sendfile), no JSON."""
     try:
         project_root = normalize_path(project_path=project_path)
-        abs_path = os.path.abspath(os.path.join(project_root, path))
-        
         # Security check: ensure path is within project root
-        if not abs_path.startswith(os.path.abspath(project_root)):
+        abs_path = resolve_in_root(project_root, path)
+        if abs_path is None:
              raise HTTPException(status_code=403, detail="Access denied: File outside project root")
+
+        if raw:
+            if not await asyncio.to_thread(os.path.isfile, abs_path):
+                raise HTTPException(status_code=404, detail="File not found")
+            return FileResponse(abs_path, media_type="text/plain; charset=utf-8")
              
-        if not os.path.exists(abs_path):
+        # BLOCKING I/O: existence check + read in one thread hop
+        content = await asyncio.to_thread(read_text, abs_path)
+        if content is None:
              raise HTTPException(status_code=404, detail="File not found")
-             
-        with open(abs_path, "r", encoding="utf-8", errors="replace") as f:
-            content = f.read()
             
         return {"content": content, "path": path}
     except HTTPException:
@@ -266,59 +317,85 @@ async def get_file_diff(
     files: List[str], # List of relative paths
     run_id: str = Query(...),
     session_id: str = Query(...),
-    project_path: str = Query(...)
+    project_path: str = Query(...),
+    stream: bool = Query(False)
 ):
     """
     Returns diffs for the specified files against their shadow backup for this run.
+    With stream=1 the diffs are sent as NDJSON lines ({"path", "diff"}) as soon as each one is ready.
     """
     try:
         project_root = normalize_path(project_path=project_path)
         shadow_ws = ShadowWorkspace.get_instance()
         # Ensure context is set for internal helper usage if needed, though we pass params explicitly usually
         
-        diffs = {}
-        
-        for rel_path in files:
-            abs_path = os.path.join(project_root, rel_path)
-            
-            # 1. Get Current Content
-            current_content = ""
-            if os.path.exists(abs_path):
-                with open(abs_path, "r", encoding="utf-8", errors="replace") as f:
-                    current_content = f.read()
-            
-            # 2. Get Shadow Content
-            # Manually construct shadow path since ShadowWorkspace doesn't expose a 'read' method publicly
-            # but we can use private helper logic re-implemented or just add a helper method.
-            # Let's peek into the implementation detail for speed, or better, stick to the pattern:
-            # .crick/history/<session_id>/<run_id>/<rel_path>
-            shadow_path = os.path.join(project_root, ".crick", "history", session_id, run_id, rel_path)
-            
-            shadow_content = ""
-            if os.path.exists(shadow_path):
-                with open(shadow_path, "r", encoding="utf-8", errors="replace") as f:
-                    shadow_content = f.read()
-            else:
-                # If shadow doesn't exist, maybe it was a new file?
-                # If new file, shadow is empty (effectively).
-                pass
-
-            # 3. Generate Diff
+        # Manually construct shadow path since ShadowWorkspace doesn't expose a 'read' method publicly
+        # Pattern: .crick/history/<session_id>/<run_id>/<rel_path>
+        shadow_root = resolve_in_root(project_root, ".crick", "history", session_id, run_id)
+        if shadow_root is None:
+            raise HTTPException(status_code=403, detail="Access denied: Path outside project root")
+
+        def diff_one(rel_path: str) -> Optional[str]:
+            current_path = resolve_in_root(project_root, rel_path)
+            shadow_path = resolve_in_root(shadow_root, rel_path)
+            if current_path is None or shadow_path is None:
+                return None
+
+            # Missing current file = deleted; missing shadow = new file. Both read as empty.
+            current_bytes = read_bytes(current_path) or b""
+            shadow_bytes = read_bytes(shadow_path) or b""
+
+            # Identical bytes: skip decode + splitlines entirely
+            if current_bytes == shadow_bytes:
+                return None
+
+            current_content = decode_text(current_bytes)
+            shadow_content = decode_text(shadow_bytes)
             if current_content == shadow_content:
-                continue
+                return None
 
-            diff_gen = difflib.unified_diff(
-                shadow_content.splitlines(keepends=True),
-                current_content.splitlines(keepends=True),
+            # Common head/tail lines are trimmed before the (quadratic) matcher runs
+            return unified_diff_text(
+                shadow_content,
+                current_content,
                 fromfile=f"Original/{rel_path}",
                 tofile=f"Modified/{rel_path}"
             )
-            diff_text = "".join(diff_gen)
-            
-            diffs[rel_path] = diff_text
+
+        # Duplicate paths in the request would be read and diffed twice
+        files = list(dict.fromkeys(files))
+
+        if stream:
+            async def diff_with_path(rel_path: str):
+                return rel_path, await asyncio.to_thread(diff_one, rel_path)
+
+            async def ndjson_generator():
+                tasks = [asyncio.ensure_future(diff_with_path(rel_path)) for rel_path in files]
+                try:
+                    # Fast files surface first; unchanged ones never get serialized
+                    for next_done in asyncio.as_completed(tasks):
+                        rel_path, diff_text = await next_done
+                        if diff_text is not None:
+                            yield orjson.dumps({"path": rel_path, "diff": diff_text}) + b"\n"
+                finally:
+                    for task in tasks:
+                        task.cancel()
+
+            return StreamingResponse(ndjson_generator(), media_type="application/x-ndjson")
+
+        # BLOCKING I/O + CPU-bound diffing: one worker thread task per file, run concurrently
+        results = await asyncio.gather(*[asyncio.to_thread(diff_one, rel_path) for rel_path in files])
+
+        diffs = {
+            rel_path: diff_text
+            for rel_path, diff_text in zip(files, results)
+            if diff_text is not None
+        }
             
         return {"diffs": diffs}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Diff Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -335,7 +412,9 @@ async def chat_endpoint(req: ChatRequest):
     """
     try:
         # Check if the project path is valid and initialize codebase monitoring
-        await codebase_registry.ensure_initialized(req.project_path)
+        # (already-active projects take the synchronous fast path)
+        if not codebase_registry.try_acquire(req.project_path):
+            await codebase_registry.ensure_initialized(req.project_path)
 
         # Retrieve or generate session ID to maintain conversation state
         session_id = req.session_id or generate_session_id()
@@ -369,6 +448,8 @@ async def chat_endpoint(req: ChatRequest):
             media_type="text/event-stream"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Chat Error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -390,18 +471,20 @@ async def upload_template_zip(
     try:
         # Parse LLM Settings
         try:
-            settings_dict = json.loads(llm_settings)
+            settings_dict = orjson.loads(llm_settings)
             parsed_settings = LLMSettings(**settings_dict)
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Invalid LLM Settings: {e}")
 
-        # Save ZIP temporarily (Use Global Temp)
-        temp_dir = os.path.join(GLOBAL_CRICK_DIR, ".temp_upload")
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_zip_path = os.path.join(temp_dir, file.filename)
-        
-        with open(temp_zip_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Spool the upload to our own temp file, here: FastAPI closes form files when the endpoint returns
+        # (before the stream below runs). File-backed, so large ZIPs don't sit in RAM; closed (and removed) by the generator.
+        zip_stream = tempfile.TemporaryFile()
+        try:
+            await asyncio.to_thread(shutil.copyfileobj, file.file, zip_stream)
+            zip_stream.seek(0)
+        except Exception:
+            zip_stream.close()
+            raise
 
         async def progress_generator():
             # USE GLOBAL DIRECTORY for Template Indexing
@@ -411,22 +494,99 @@ async def upload_template_zip(
             indexer = TemplateIndexer(GLOBAL_CRICK_DIR, llm_settings=parsed_settings)
             
             try:
-                async for event in indexer.process_template_zip(temp_zip_path):
+                async for event in indexer.process_template_zip(zip_stream):
                     # SSE Format: data: <json>\n\n
-                    yield f"data: {json.dumps(event)}\n\n"
+                    yield b"data: " + orjson.dumps(event) + b"\n\n"
                     
             except Exception as e:
-                yield f"data: {json.dumps({'status': 'error', 'message': str(e)})}\n\n"
+                yield b"data: " + orjson.dumps({'status': 'error', 'message': str(e)}) + b"\n\n"
             finally:
-                if os.path.exists(temp_zip_path):
-                    os.remove(temp_zip_path)
+                # Also runs on client disconnect (generator closed)
+                zip_stream.close()
 
         return StreamingResponse(progress_generator(), media_type="text/event-stream")
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Upload Error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+def _get_templates_db():
+    # Shared LanceDB connection for the global templates DB (opened lazily, same one the template tools use)
+    return get_lancedb_connection(GLOBAL_TEMPLATES_DB_PATH)
+
+def _scan_one_template(name: str, has_public_dir: bool = True) -> Dict[str, Any]:
+    """Builds the listing entry for a single template (preview check + manifest read)."""
+    # List the template dir once instead of stat-ing each expected file
+    public_dir = f"{GLOBAL_PUBLIC_TEMPLATES_DIR}{os.sep}{name}"
+    entry_names = set()
+    if has_public_dir:
+        try:
+            with os.scandir(public_dir) as it:
+                entry_names = {entry.name for entry in it}
+        except OSError:
+            pass
+
+    # Check for preview image
+    has_preview = "theme_screen.png" in entry_names
+
+    # Default Metadata
+    metadata = {
+        "name": name.replace("-", " ").title(),
+        "description": "",
+        "author": "",
+        "version": ""
+    }
+
+    # Read Manifest if exists
+    if "manifest.json" in entry_names:
+        try:
+            with open(f"{public_dir}{os.sep}manifest.json", "rb") as f:
+                manifest_data = orjson.loads(f.read())
+                metadata.update(manifest_data) # Override defaults
+        except Exception as e:
+            logger.warning(f"Error reading manifest for {name}: {e}")
+
+    return {
+        "id": name,
+        "name": metadata.get("name"),
+        "description": metadata.get("description"),
+        "author": metadata.get("author"),
+        "version": metadata.get("version"),
+        "preview_url": f"/public/templates/{name}/theme_screen.png" if has_preview else None,
+        "installed_at": None
+    }
+
+@lru_cache(maxsize=1)
+def _scan_templates_cached(db_mtime: int, public_mtime: int) -> List[Dict[str, Any]]:
+    """
+    Scans the GLOBAL LanceDB tables and public assets.
+    Keyed on the directories' mtimes: adding/dropping a template changes them and invalidates the cache.
+    """
+    # Fresh install (no tables yet): don't spin up the LanceDB runtime at all
+    with os.scandir(GLOBAL_TEMPLATES_DB_PATH) as it:
+        if next(it, None) is None:
+            return []
+
+    db = _get_templates_db()
+    table_names = db.table_names()
+
+    # One pass over public/templates: templates without a public dir skip their own scandir
+    try:
+        with os.scandir(GLOBAL_PUBLIC_TEMPLATES_DIR) as it:
+            public_dirs = {entry.name for entry in it if entry.is_dir()}
+    except OSError:
+        public_dirs = set()
+    has_public_dir = [name in public_dirs for name in table_names]
+
+    if len(table_names) <= 1:
+        return [_scan_one_template(name, has_dir) for name, has_dir in zip(table_names, has_public_dir)]
+
+    # Per-template stat + manifest reads are I/O bound: run them concurrently (order preserved)
+    with ThreadPoolExecutor(max_workers=min(16, len(table_names))) as pool:
+        return list(pool.map(_scan_one_template, table_names, has_public_dir))
+
 @app.get("/api/templates")
 def list_templates(project_path: str = None):
     """
@@ -435,55 +595,27 @@ def list_templates(project_path: str = None):
     """
     try:
         # USE GLOBAL_CRICK_DIR (User Data)
-        db_path = os.path.join(GLOBAL_CRICK_DIR, "knowledge_base", "templates_db")
-        public_templates = os.path.join(GLOBAL_CRICK_DIR, "public", "templates")
-        
         templates = []
         
         # 1. Get List from DB (if exists)
-        if os.path.exists(db_path):
+        try:
+            db_mtime = os.stat(GLOBAL_TEMPLATES_DB_PATH).st_mtime_ns
+        except FileNotFoundError:
+            db_mtime = None
+
+        if db_mtime is not None:
             try:
-                db = lancedb.connect(db_path)
-                table_names = db.table_names()
-                
-                for name in table_names:
-                    # Check for preview image
-                    public_dir = os.path.join(public_templates, name)
-                    preview_path = os.path.join(public_dir, "theme_screen.png")
-                    manifest_path = os.path.join(public_dir, "manifest.json")
-                    
-                    has_preview = os.path.exists(preview_path)
-                    
-                    # Default Metadata
-                    metadata = {
-                        "name": name.replace("-", " ").title(),
-                        "description": "",
-                        "author": "",
-                        "version": ""
-                    }
-
-                    # Read Manifest if exists
-                    if os.path.exists(manifest_path):
-                        try:
-                            with open(manifest_path, "r", encoding="utf-8") as f:
-                                manifest_data = json.load(f)
-                                metadata.update(manifest_data) # Override defaults
-                        except Exception as e:
-                            logger.warning(f"Error reading manifest for {name}: {e}")
-                    
-                    templates.append({
-                        "id": name,
-                        "name": metadata.get("name"),
-                        "description": metadata.get("description"),
-                        "author": metadata.get("author"),
-                        "version": metadata.get("version"),
-                        "preview_url": f"/public/templates/{name}/theme_screen.png" if has_preview else None,
-                        "installed_at": None
-                    })
+                try:
+                    public_mtime = os.stat(GLOBAL_PUBLIC_TEMPLATES_DIR).st_mtime_ns
+                except FileNotFoundError:
+                    public_mtime = 0
+                templates = _scan_templates_cached(db_mtime, public_mtime)
             except Exception as e:
                 logger.error(f"Error reading LanceDB: {e}")
 
         return {"templates": templates}
+    except HTTPException:
+        raise
     except Exception as e:
          logger.error(f"List Templates Error: {e}", exc_info=True)
          raise HTTPException(status_code=500, detail=str(e))
@@ -497,24 +629,28 @@ def delete_template(template_id: str):
     """
     try:
         # 1. Delete Public Files (Global)
-        public_dir = os.path.join(GLOBAL_CRICK_DIR, "public", "templates", template_id)
+        public_dir = os.path.join(GLOBAL_PUBLIC_TEMPLATES_DIR, template_id)
         if os.path.exists(public_dir):
             shutil.rmtree(public_dir)
             logger.info(f"Deleted public assets for {template_id}")
 
         # 2. Delete from DB (Global)
-        db_path = os.path.join(GLOBAL_CRICK_DIR, "knowledge_base", "templates_db")
-        if os.path.exists(db_path):
+        if os.path.exists(GLOBAL_TEMPLATES_DB_PATH):
             try:
-                db = lancedb.connect(db_path)
+                db = _get_templates_db()
                 db.drop_table(template_id)
                 logger.info(f"Dropped table {template_id}")
             except Exception as e:
                 # If table doesn't exist, we can ignore (maybe it was partial install)
                 logger.warning(f"Could not drop table {template_id}: {e}")
 
+        # Agents built for this theme point at the dropped table
+        invalidate_agents(theme_id=template_id)
+
         return {"status": "success", "message": f"Template {template_id} deleted."}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Delete Template Error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -529,6 +665,8 @@ async def get_sessions_endpoint(project_path: str):
 
         sessions = await list_sessions_with_summary(project_root=abs_path)
         return {"project_path": abs_path, "sessions": sessions, "count": len(sessions)}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"List Sessions Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -542,7 +680,12 @@ async def delete_session_endpoint(session_id: str, project_path: Optional[str] =
         if not success:
             raise HTTPException(status_code=404, detail="Session not found")
 
+        # Cached agents of the deleted session would keep its (now gone) history alive
+        invalidate_agents(project_root=root, session_id=session_id)
+
         return {"success": True, "session_id": session_id}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Delete Session Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -568,10 +711,10 @@ async def get_session_history_endpoint(session_id: str, project_path: Optional[s
         if not runs:
             return {"messages": []}
 
-        # Trasforma runs in messaggi
-        messages = transform_runs_to_messages(runs)
-
-        return {"messages": messages}
+        # Trasforma runs in messaggi e serializza in un solo passaggio, fuori dal loop eventi
+        # (i runs sono già tutti in memoria: lo streaming per messaggio costava un hop di threadpool ciascuno)
+        body = await asyncio.to_thread(messages_json, runs)
+        return Response(content=body, media_type="application/json")
 
     except HTTPException:
         raise
@@ -579,14 +722,28 @@ async def get_session_history_endpoint(session_id: str, project_path: Optional[s
         logger.error(f"Session History Error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+# Health body cached with 1-second granularity: (epoch second, serialized body)
+_health_cache = (0, b"")
+
 @app.get("/api/health")
 def health_check():
-    return {"status": "ok", "timestamp": datetime.datetime.utcnow().isoformat()}
+    global _health_cache
+    now_s = time.time_ns() // 1_000_000_000
+    if now_s != _health_cache[0]:
+        # Derive the ISO string from the same clock reading as the cache key
+        timestamp = datetime.datetime.fromtimestamp(now_s, tz=datetime.timezone.utc).isoformat()
+        _health_cache = (now_s, orjson.dumps({"status": "ok", "timestamp": timestamp}))
+    # Fresh Response per request: middlewares mutate response headers in place
+    return Response(content=_health_cache[1], media_type="application/json")
+
+# Constant body, serialized once at import
+_AGENTS_BODY = orjson.dumps({"agents": ["ARCHITECT", "PLANNER", "CODER"]})
 
 @app.get("/api/agents")
 def get_agents():
     """Returns the list of available agents."""
-    return {"agents": ["ARCHITECT", "PLANNER", "CODER"]}
+    # Fresh Response per request (middlewares mutate headers in place), body is precomputed
+    return Response(content=_AGENTS_BODY, media_type="application/json")
 
 if __name__ == "__main__":
     import argparse
@@ -603,12 +760,18 @@ if __name__ == "__main__":
     # Check if running in frozen mode (PyInstaller)
     is_frozen = getattr(sys, 'frozen', False)
 
+    # uvicorn's loop/http "auto" picks uvloop + httptools when installed (see requirements.txt)
+    # and falls back to asyncio + h11 (e.g. uvloop on Windows). Single worker on purpose:
+    # watchers, shadow workspace and paused HITL runs live in this process.
+    # CRICKCODER_DISABLE_UVLOOP=1 forces the stock asyncio loop (debugging / compatibility).
+    loop_impl = "asyncio" if os.environ.get("CRICKCODER_DISABLE_UVLOOP") == "1" else "auto"
+
     if is_frozen:
         # In frozen mode, passing the string "server:app" fails because uvicorn 
         # tries to import "server" which doesn't exist as a file.
         # We must pass the app object directly. Reload is not supported in frozen mode.
         # We also disable workers logic if any, just run simple.
-        uvicorn.run(app, host=args.host, port=args.port, reload=False)
+        uvicorn.run(app, host=args.host, port=args.port, reload=False, loop=loop_impl)
     else:
         # In dev mode, use string to enable hot reload
-        uvicorn.run("server:app", host=args.host, port=args.port, reload=args.reload)
\ No newline at end of file
+        uvicorn.run("server:app", host=args.host, port=args.port, reload=args.reload, loop=loop_impl)
\ No newline at end of file
@@ -15,9 +15,9 @@ from PyInstaller.utils.hooks import collect_all
 
 # AUTOMATIC COLLECTION: Robustly collect everything for complex packages
 packages_to_collect = [
-    'uvicorn', 'fastapi', 'agno', 'pydantic', 
+    'uvicorn', 'uvloop', 'httptools', 'fastapi', 'agno', 'pydantic', 
     'lancedb', 'pyarrow', 'tantivy', 'pandas', 'sqlalchemy', 'aiosqlite',
-    'watchdog', 'pathspec',
+    'watchdog', 'pathspec', 'lxml',
     'langchain_core', 'langchain_text_splitters',
     'sentence_transformers', 'torch', 'numpy',
     'openai', 'anthropic', 'ollama', 'google_genai', 'google.generativeai',
@@ -1,9 +1,8 @@
 import platform
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 from agno.agent import Agent
-from agno.compression.manager import CompressionManager
-from src.core.config.factory_models import build_model_for_runtime
-from src.core.config.model_limits import get_token_limit_for_model
+from src.agents.common import build_agent_model
 from src.core.storage.knowledge import get_shared_knowledge
 from src.core.storage.storage import get_agent_storage
 from src.prompts.loader import load_prompt
@@ -16,16 +15,23 @@ from src.tools.crickcoder_shell_tools import CrickCoderShellTools
 from src.tools.crickcoder_template_tools import CrickCoderTemplateTools
 from pathlib import Path
 
+# Host OS doesn't change at runtime: compute the context line once
+OS_CONTEXT = f"SYSTEM OS: {platform.system()} ({platform.release()})."
+
+@lru_cache(maxsize=32)
+def _coder_instructions(model_id: str) -> Tuple[str, ...]:
+    """Instructions per model_id, assembled once (prompt file + OS context + workflow)."""
+    return (
+        load_prompt("coder.md", model_id=model_id),
+        OS_CONTEXT,
+        "Follow the Strict Workflow: Orientation -> Planning -> Execution -> Reporting."
+    )
+
 def build_coder(project_root: str, session_id: str, auto_approval: bool = False, llm_settings: Optional[LLMSettings] = None, selected_theme_id: Optional[str] = None):
     """
     Builds the Coder Agent (Single Agent with Tools).
     """
     
-    # 1. Context OS (Imperative)
-    current_os = platform.system()
-    os_release = platform.release()
-    os_context = f"SYSTEM OS: {current_os} ({os_release})."
-
     storage = get_agent_storage(project_root=project_root) 
     
     # 2. Safety Configuration
@@ -57,14 +63,8 @@ def build_coder(project_root: str, session_id: str, auto_approval: bool = False,
     template_tools = CrickCoderTemplateTools(project_root=project_root, llm_settings=llm_settings)
     tools_list.append(template_tools)
 
-    # 4. Build Model
-    model = build_model_for_runtime(
-        provider=llm_settings.provider,
-        model_id=llm_settings.model_id,
-        temperature=llm_settings.temperature,
-        api_key=llm_settings.api_key,
-        base_url=llm_settings.base_url
-    )
+    # 4. Build Model (+ Compression Manager)
+    model, compression_manager = build_agent_model(llm_settings)
 
     # 5. Create Agent
     return Agent(
@@ -72,11 +72,7 @@ def build_coder(project_root: str, session_id: str, auto_approval: bool = False,
         role="Senior Developer",
         model=model,
         # Compression Manager
-        compression_manager=CompressionManager(
-            model=model,
-            compress_tool_results=False,
-            compress_token_limit=get_token_limit_for_model(llm_settings.model_id, llm_settings.compression_threshold)
-        ),
+        compression_manager=compression_manager,
         # Shared Knowledge
         knowledge=get_shared_knowledge(project_root),
         search_knowledge=True, 
@@ -84,18 +80,17 @@ def build_coder(project_root: str, session_id: str, auto_approval: bool = False,
         # Tools List
         tools=tools_list,
         
-        # Instructions
-        instructions=[
-            load_prompt("coder.md", model_id=llm_settings.model_id),
-            os_context,
-            "Follow the Strict Workflow: Orientation -> Planning -> Execution -> Reporting."
-        ],
+        # Instructions (1. Context OS included); Agent expects a list
+        instructions=list(_coder_instructions(llm_settings.model_id)),
         
         # Storage & Session
         db=storage,
         session_id=session_id,
+        # Older turns reach the model through the rolling session summary;
+        # only the last 2 runs are replayed verbatim (constant prompt size per turn)
+        enable_session_summaries=True,
         add_history_to_context=True, 
-        num_history_runs=5,
+        num_history_runs=2,
         
         debug_mode=True,
         markdown=True
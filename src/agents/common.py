@@ -0,0 +1,18 @@
+from typing import Any, Tuple
+from agno.compression.manager import CompressionManager
+from src.core.config.factory_models import build_model_for_runtime, prepare_model_config
+from src.core.config.model_limits import get_token_limit_for_model
+from src.models import LLMSettings
+
+def build_agent_model(llm_settings: LLMSettings) -> Tuple[Any, CompressionManager]:
+    """
+    Setup comune a Coder e Planner: una nuova istanza del modello per ogni chiamata (condivisa solo
+    con il Compression Manager dello stesso agente) e Compression Manager con il limite di token del modello.
+    """
+    model = build_model_for_runtime(*prepare_model_config(llm_settings))
+    compression_manager = CompressionManager(
+        model=model,
+        compress_tool_results=False,
+        compress_token_limit=get_token_limit_for_model(llm_settings.model_id, llm_settings.compression_threshold)
+    )
+    return model, compression_manager
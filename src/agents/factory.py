@@ -1,11 +1,144 @@
-from typing import Dict, Optional, Any
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+import threading
+from typing import Dict, Optional, Any, Tuple
 from agno.agent import Agent
 from src.models import LLMSettings
+from src.core.config.factory_models import prepare_model_config
+from src.core.runtime.project_init import canonical_project_root
 
 # Importiamo le funzioni dai nuovi file specifici
 from src.agents.coder import build_coder
 from src.agents.planner import build_planner
 
+logger = logging.getLogger(__name__)
+
+_warmup_started = False
+_warmup_lock = threading.Lock()
+
+def _warmup_worker() -> None:
+    try:
+        # Import locali: il modello (e torch) si caricano solo nel thread di warmup
+        from src.core.storage.embedder import get_shared_embedder
+        from src.core.indexing.chunker import AdaptiveChunker
+
+        get_shared_embedder().get_embedding("warmup")
+        AdaptiveChunker()._get_splitter("x.py")
+        logger.info("Warmup embedder/chunker completato.")
+    except Exception as e:
+        logger.warning(f"Warmup embedder fallito (verrà caricato al primo uso): {e}")
+
+def start_background_warmup() -> None:
+    """
+    Avvia una sola volta per processo il caricamento dell'embedder in un thread daemon,
+    così la prima ricerca non paga il cold start del modello.
+    Disattivabile con CRICKCODER_DISABLE_WARMUP=1 (es. test).
+    """
+    global _warmup_started
+
+    if _warmup_started or os.environ.get("CRICKCODER_DISABLE_WARMUP") == "1":
+        return
+    with _warmup_lock:
+        if _warmup_started:
+            return
+        _warmup_started = True
+    threading.Thread(target=_warmup_worker, name="crick-warmup", daemon=True).start()
+
+class LazyAgent:
+    """
+    Proxy che costruisce l'agente reale solo al primo accesso a un attributo.
+    Le richieste instradano a un solo agente: gli altri non pagano mai il costo di build.
+    """
+
+    def __init__(self, builder, *args, **kwargs):
+        object.__setattr__(self, "_builder", builder)
+        object.__setattr__(self, "_args", args)
+        object.__setattr__(self, "_kwargs", kwargs)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _resolve(self) -> Agent:
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                # Double-check: un solo build anche con accessi concorrenti
+                instance = self._instance
+                if instance is None:
+                    instance = self._builder(*self._args, **self._kwargs)
+                    object.__setattr__(self, "_instance", instance)
+        return instance
+
+    async def aresolve(self) -> Agent:
+        """Restituisce l'agente reale; se non ancora costruito lo costruisce in un worker thread."""
+        instance = self._instance
+        if instance is None:
+            instance = await asyncio.to_thread(self._resolve)
+        return instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._resolve(), name, value)
+
+    def __repr__(self) -> str:
+        if self._instance is None:
+            return f"<LazyAgent {self._builder.__name__} (not built)>"
+        return repr(self._instance)
+
+# Cache LRU degli agenti costruiti: i turni successivi della stessa sessione li riusano.
+# Le mappe vengono prese in prestito (rimosse dalla cache) per la durata di un turno e
+# restituite con release_agents: due richieste sovrapposte non eseguono mai lo stesso Agent.
+_AGENTS_CACHE_SIZE = 64
+_agents_cache: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+_agents_lock = threading.Lock()
+
+def _agents_key(project_root: str, session_id: str, auto_approval: bool, llm_settings: Optional[LLMSettings], selected_theme_id: Optional[str]) -> Tuple:
+    # Impronta delle impostazioni LLM (api_key inclusa, ma solo come hash)
+    llm_key = hashlib.sha256(llm_settings.model_dump_json().encode("utf-8")).hexdigest() if llm_settings else None
+    # Stessa chiave canonica della knowledge base condivisa
+    return (canonical_project_root(project_root), session_id, auto_approval, llm_key, selected_theme_id)
+
+def get_agents(project_root: str, session_id: str, auto_approval: bool = False, llm_settings: Optional[LLMSettings] = None, selected_theme_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Come build_agents, ma riusa gli agenti già costruiti per la stessa configurazione.
+    La mappa restituita è in uso esclusivo del chiamante finché non la restituisce con release_agents;
+    nel frattempo una richiesta concorrente con la stessa chiave riceve una mappa nuova.
+    """
+    key = _agents_key(project_root, session_id, auto_approval, llm_settings, selected_theme_id)
+    with _agents_lock:
+        agents = _agents_cache.pop(key, None)
+    if agents is not None:
+        return agents
+
+    return build_agents(project_root, session_id, auto_approval, llm_settings, selected_theme_id)
+
+def release_agents(agents: Dict[str, Any], project_root: str, session_id: str, auto_approval: bool = False, llm_settings: Optional[LLMSettings] = None, selected_theme_id: Optional[str] = None) -> None:
+    """Restituisce alla cache una mappa ottenuta da get_agents, a turno concluso."""
+    key = _agents_key(project_root, session_id, auto_approval, llm_settings, selected_theme_id)
+    with _agents_lock:
+        _agents_cache[key] = agents
+        _agents_cache.move_to_end(key)
+        while len(_agents_cache) > _AGENTS_CACHE_SIZE:
+            _agents_cache.popitem(last=False)
+
+def invalidate_agents(project_root: Optional[str] = None, session_id: Optional[str] = None, theme_id: Optional[str] = None) -> None:
+    """
+    Rimuove dalla cache le mappe che corrispondono a tutti i filtri indicati
+    (progetto chiuso, sessione o tema eliminati). Senza filtri svuota la cache.
+    """
+    root = canonical_project_root(project_root) if project_root else None
+    with _agents_lock:
+        for key in list(_agents_cache):
+            key_root, key_session, _, _, key_theme = key
+            if root is not None and key_root != root: continue
+            if session_id is not None and key_session != session_id: continue
+            if theme_id is not None and key_theme != theme_id: continue
+            del _agents_cache[key]
+
 def build_agents(project_root: str, session_id: str, auto_approval: bool = False, llm_settings: Optional[LLMSettings] = None, selected_theme_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Factory principale che assembla il team.
@@ -18,14 +151,20 @@ def build_agents(project_root: str, session_id: str, auto_approval: bool = False
         selected_theme_id: ID del tema selezionato (se presente).
     """
 
-    # 1. Costruisci Coder
-    coder = build_coder(project_root, session_id, auto_approval, llm_settings, selected_theme_id)
+    # Validazione una sola volta, qui: i builder lazy non falliscono più al primo utilizzo
+    prepare_model_config(llm_settings)
+
+    args = (project_root, session_id, auto_approval, llm_settings, selected_theme_id)
+
+    # 1-2. Coder e Planner lazy: costruiti al primo utilizzo (le eccezioni dei builder emergono lì)
+    coder = LazyAgent(build_coder, *args)
+    planner = LazyAgent(build_planner, *args)
 
-    # 2. Costruisci Planner
-    planner = build_planner(project_root, session_id, auto_approval, llm_settings, selected_theme_id)
+    # Embedder caricato in background mentre l'utente scrive/aspetta il primo token
+    start_background_warmup()
 
     # 3. Restituisci la mappa
     return {
         "CODER": coder,
         "PLANNER": planner
-    }
\ No newline at end of file
+    }
@@ -1,9 +1,8 @@
 import platform
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 from agno.agent import Agent
-from agno.compression.manager import CompressionManager
-from src.core.config.factory_models import build_model_for_runtime
-from src.core.config.model_limits import get_token_limit_for_model
+from src.agents.common import build_agent_model
 from src.core.storage.knowledge import get_shared_knowledge
 from src.core.storage.storage import get_agent_storage
 from src.prompts.loader import load_prompt
@@ -12,6 +11,17 @@ from src.tools.crickcoder_template_tools import CrickCoderTemplateTools
 
 from src.tools.crick_brain_tools import CrickBrainTools
 
+# Host OS doesn't change at runtime: compute the context line once
+OS_CONTEXT = f"SYSTEM CONTEXT: Host OS is {platform.system()}."
+
+@lru_cache(maxsize=32)
+def _planner_instructions(model_id: str) -> Tuple[str, ...]:
+    """Instructions per model_id, assembled once (prompt file + OS context)."""
+    return (
+        load_prompt("planner.md", model_id=model_id),
+        OS_CONTEXT
+    )
+
 def build_planner(project_root: str, session_id: str, auto_approval: bool = False, llm_settings: Optional[LLMSettings] = None, selected_theme_id: Optional[str] = None):
     """
     Costruisce l'agente Planner.
@@ -19,24 +29,13 @@ def build_planner(project_root: str, session_id: str, auto_approval: bool = Fals
     """
     storage = get_agent_storage(project_root=project_root) 
     
-    current_os = platform.system()
-    os_context = f"SYSTEM CONTEXT: Host OS is {current_os}."
-
-    instructions_list = [
-            load_prompt("planner.md", model_id=llm_settings.model_id),
-            os_context
-        ]
-
     if not llm_settings:
         raise ValueError("llm_settings e' obbligatorio per costruire l'agente Planner")
 
-    model = build_model_for_runtime(
-        provider=llm_settings.provider,
-        model_id=llm_settings.model_id,
-        temperature=llm_settings.temperature,
-        api_key=llm_settings.api_key,
-        base_url=llm_settings.base_url
-    )
+    # Agent expects a list: fresh copy of the cached tuple
+    instructions_list = list(_planner_instructions(llm_settings.model_id))
+
+    model, compression_manager = build_agent_model(llm_settings)
     
     # Base tools
     tools_list = [
@@ -52,11 +51,7 @@ def build_planner(project_root: str, session_id: str, auto_approval: bool = Fals
         role="Technical Lead",
         model=model,
         # Compression Manager to save context
-        compression_manager=CompressionManager(
-            model=model,
-            compress_tool_results=False, 
-            compress_token_limit=get_token_limit_for_model(llm_settings.model_id, llm_settings.compression_threshold)
-        ),
+        compression_manager=compression_manager,
         knowledge=get_shared_knowledge(project_root),
         search_knowledge=True,
         db=storage,
@@ -66,7 +61,8 @@ def build_planner(project_root: str, session_id: str, auto_approval: bool = Fals
         instructions=instructions_list,
         markdown=True,
         debug_mode=True,
+        # Older turns reach the model through the session summary; replay only the last 2 runs
         add_history_to_context=True,
-        num_history_runs=5,
+        num_history_runs=2,
         tools=tools_list
     )
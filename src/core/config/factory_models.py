@@ -1,5 +1,5 @@
 import logging
-from typing import Any, Dict, Type, Optional
+from typing import Any, Dict, Type, Optional, Tuple
 
 # Agno Model Imports
 from agno.models.openai import OpenAIChat, OpenAILike
@@ -10,6 +10,8 @@ from agno.models.ollama import Ollama
 from agno.models.openrouter import OpenRouter
 from agno.models.anthropic import Claude
 
+from src.core.config.http_pool import install_agno_default_clients
+
 logger = logging.getLogger(__name__)
 
 # Registry for dynamic instantiation
@@ -39,27 +41,61 @@ PROVIDER_ALIASES = {
     "openai_chat": "openai",
 }
 
+# Alias (or canonical key) -> model class, precomputed: one lookup per build
+_PROVIDER_TO_CLASS: Dict[str, Type] = {
+    **MODEL_REGISTRY,
+    **{alias: MODEL_REGISTRY[canonical] for alias, canonical in PROVIDER_ALIASES.items()},
+}
+
+# (provider, model_id, temperature, api_key, base_url): same order as build_model_for_runtime
+ModelConfig = Tuple[str, str, float, Optional[str], Optional[str]]
+
+def prepare_model_config(llm_settings: Any, temperature: Optional[float] = None) -> ModelConfig:
+    """
+    Validates LLM settings once and returns the positional args for build_model_for_runtime.
+    temperature overrides the configured one (e.g. low-temperature helper agents).
+    """
+    if not llm_settings:
+        raise ValueError("llm_settings is required to build a model")
+    return (
+        llm_settings.provider,
+        llm_settings.model_id,
+        llm_settings.temperature if temperature is None else temperature,
+        llm_settings.api_key,
+        llm_settings.base_url,
+    )
+
 def build_model_for_runtime(
     provider: str,
     model_id: str,
     temperature: float,
     api_key: Optional[str] = None,
-    base_url: Optional[str] = None
+    base_url: Optional[str] = None,
+    *,
+    timeout: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    max_retries: Optional[int] = None
 ) -> Any:
     """
     Creates an Agno model instance with provided credentials and settings.
     If api_key is None, Agno will automatically fallback to environment variables.
+    Every call returns a new instance (models carry lazy clients and per-run state, so each
+    agent gets its own); the HTTP connection pool underneath is process-wide (see http_pool).
+    timeout / max_tokens / max_retries bound background calls (e.g. template analysis); each is
+    applied only if the provider's model class supports it.
     """
     provider_key = provider.lower()
-    # Normalize using aliases
-    canonical_key = PROVIDER_ALIASES.get(provider_key, provider_key)
-    model_class = MODEL_REGISTRY.get(canonical_key)
+    # Aliases are folded into the lookup table
+    model_class = _PROVIDER_TO_CLASS.get(provider_key)
 
     if not model_class:
         raise ValueError(f"Unknown provider: {provider}. Supported: {list(MODEL_REGISTRY.keys())}")
 
     logger.info(f"Building model: {provider_key} | ID: {model_id} | Temp: {temperature} | BaseURL: {base_url}")
 
+    # Pooled httpx clients shared by all models (no-op after the first call)
+    install_agno_default_clients()
+
     # Configuration dictionary for the constructor
     config = {
         "id": model_id,
@@ -74,4 +110,10 @@ def build_model_for_runtime(
     if base_url:
         config["base_url"] = base_url
 
+    # Optional call bounds: not every provider class has every field (Agno models are dataclasses)
+    supported = getattr(model_class, "__dataclass_fields__", {})
+    for field, value in (("timeout", timeout), ("max_tokens", max_tokens), ("max_retries", max_retries)):
+        if value is not None and field in supported:
+            config[field] = value
+
     return model_class(**config)
\ No newline at end of file
@@ -0,0 +1,65 @@
+import logging
+import threading
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# One connection pool per process for all LLM provider clients:
+# rebuilding agents/models must not mean new TCP/TLS handshakes
+_LIMITS = httpx.Limits(max_keepalive_connections=100, max_connections=200)
+# Provider SDKs pass their own per-request timeouts; this is only the fallback
+_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+_shared_async_client: Optional[httpx.AsyncClient] = None
+_shared_sync_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+_agno_defaults_installed = False
+
+def get_shared_async_client() -> httpx.AsyncClient:
+    """Returns the process-wide pooled httpx.AsyncClient (created on first use)."""
+    global _shared_async_client
+
+    if _shared_async_client is None:
+        with _client_lock:
+            # Double-check locking pattern
+            if _shared_async_client is None:
+                _shared_async_client = httpx.AsyncClient(limits=_LIMITS, timeout=_TIMEOUT, follow_redirects=True)
+
+    return _shared_async_client
+
+def get_shared_sync_client() -> httpx.Client:
+    """Returns the process-wide pooled httpx.Client (sync agent runs in worker threads)."""
+    global _shared_sync_client
+
+    if _shared_sync_client is None:
+        with _client_lock:
+            # Double-check locking pattern
+            if _shared_sync_client is None:
+                _shared_sync_client = httpx.Client(limits=_LIMITS, timeout=_TIMEOUT, follow_redirects=True)
+
+    return _shared_sync_client
+
+def install_agno_default_clients() -> bool:
+    """
+    Registers the shared clients as Agno's global defaults, used by every model class
+    that builds its SDK client over httpx (OpenAI-compatible, Claude, ...) when no
+    explicit http_client is given. Providers with their own transport (e.g. Ollama)
+    are unaffected. Idempotent; returns False if this Agno version has no such hook.
+    """
+    global _agno_defaults_installed
+
+    if _agno_defaults_installed:
+        return True
+
+    try:
+        from agno.utils.http import set_default_async_client, set_default_sync_client
+    except ImportError:
+        logger.info("Agno has no default http client hook: providers keep their own pools.")
+        return False
+
+    set_default_sync_client(get_shared_sync_client())
+    set_default_async_client(get_shared_async_client())
+    _agno_defaults_installed = True
+    return True
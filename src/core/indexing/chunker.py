@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import os
 from langchain_text_splitters import RecursiveCharacterTextSplitter, Language
 from langchain_core.documents import Document
@@ -6,6 +6,9 @@ from langchain_core.documents import Document
 class AdaptiveChunker:
     def __init__(self, small_file_threshold: int = 30000):
         self.SMALL_FILE_THRESHOLD = small_file_threshold
+        # Hot-path bindings: one attribute lookup each in chunk_content
+        self._small = small_file_threshold
+        self._Doc = Document
         
         self.LANG_MAP = {
             ".py": Language.PYTHON,
@@ -29,34 +32,67 @@ class AdaptiveChunker:
             separators=["\n\n", "\n", ">", " ", ""]
         )
 
-    def _get_splitter(self, filename: str):
-        """Helper to choose the correct splitter based on extension."""
-        ext = os.path.splitext(filename)[1].lower()
-        if ext in self.LANG_MAP:
-            return RecursiveCharacterTextSplitter.from_language(
-                language=self.LANG_MAP[ext],
+        # Splitters built once (one per language, shared by its extensions), then O(1) lookup
+        by_language = {
+            lang: RecursiveCharacterTextSplitter.from_language(
+                language=lang,
                 chunk_size=30000,
                 chunk_overlap=2000
             )
-        return self.fallback_splitter
+            for lang in set(self.LANG_MAP.values())
+        }
+        self._splitters = {ext: by_language[lang] for ext, lang in self.LANG_MAP.items()}
+
+    def _get_splitter(self, filename: str):
+        """Helper to choose the correct splitter based on extension."""
+        # rpartition: single C-level pass (vs. os.path.splitext). Anything after the last dot
+        # that isn't a real extension (e.g. "pkg.d/Makefile") simply matches no key.
+        _, dot, ext = filename.rpartition('.')
+        if not dot:
+            return self.fallback_splitter
+        return self._splitters.get('.' + ext.lower(), self.fallback_splitter)
 
     def chunk_content(self, content: str, rel_path: str) -> List[Document]:
         """
         Adaptively chunks content based on size and file type.
         Returns a list of Documents.
         """
-        file_len = len(content)
-        docs = []
+        if len(content) < self._small:
+            # Small file -> 1 Single Chunk (no splitter lookup, no try/except)
+            return [self._Doc(page_content=content)]
+
+        # Large file -> Intelligent Split
+        splitter = self._get_splitter(rel_path)
+        try: 
+            return splitter.create_documents([content])
+        except Exception: 
+            return self.fallback_splitter.create_documents([content])
 
-        if file_len < self.SMALL_FILE_THRESHOLD:
-            # Small file -> 1 Single Chunk
-            docs = [Document(page_content=content)]
-        else:
-            # Large file -> Intelligent Split
+    def chunk_many(self, contents: List[Tuple[str, str]]) -> List[List[Document]]:
+        """
+        Batch version of chunk_content for (content, rel_path) pairs.
+        Large files are grouped by splitter and split with one create_documents() call
+        per group. Results are returned in input order.
+        """
+        results: List[List[Document]] = [[] for _ in contents]
+        buckets: Dict[int, Tuple[Any, List[int]]] = {}
+        small, Doc = self._small, self._Doc
+        for i, (content, rel_path) in enumerate(contents):
+            if len(content) < small:
+                results[i] = [Doc(page_content=content)]
+                continue
             splitter = self._get_splitter(rel_path)
-            try: 
-                docs = splitter.create_documents([content])
-            except Exception: 
-                docs = self.fallback_splitter.create_documents([content])
-        
-        return docs
+            buckets.setdefault(id(splitter), (splitter, []))[1].append(i)
+        for splitter, indices in buckets.values():
+            try:
+                docs = splitter.create_documents(
+                    [contents[i][0] for i in indices],
+                    metadatas=[{"_batch_index": i} for i in indices]
+                )
+            except Exception:
+                for i in indices:
+                    results[i] = self.chunk_content(*contents[i])
+                continue
+            for doc in docs:
+                results[doc.metadata.pop("_batch_index")].append(doc)
+        return results
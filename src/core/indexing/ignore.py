@@ -2,7 +2,42 @@
 Gestione delle regole di ignore (.crickignore).
 """
 import os
-from typing import Tuple, Set
+import re
+from functools import lru_cache
+from typing import Callable, FrozenSet, Iterable, List, Set, Tuple
+
+# Una regola per riga: salta righe vuote e commenti, cattura la riga senza spazi ai bordi
+_RULE_LINE_RE = re.compile(r'^\s*([^#\s][^\n]*?)\s*$', re.MULTILINE)
+
+
+@lru_cache(maxsize=32)
+def _parse_crickignore(path: str, mtime_ns: int, size: int) -> Tuple[FrozenSet[str], FrozenSet[str], FrozenSet[str]]:
+    """Parsing memoized per (path, mtime, size): watcher e sync rileggono il file solo se cambia."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    ignore_dirs = set()
+    ignore_exts = set()
+    ignore_patterns = set()  # Pattern completi (es. ".crick/")
+
+    for line in _RULE_LINE_RE.findall(text):
+        # Aggiungi il pattern originale
+        ignore_patterns.add(line)
+
+        # Rimuove il trailing slash per le directory
+        if line.endswith('/'):
+            ignore_dirs.add(line.rstrip('/'))
+        # Estensioni di file (es. *.pyc)
+        elif line.startswith('*.'):
+            ignore_exts.add(line[1:])  # Rimuove l'asterisco
+        # Nomi di file specifici
+        elif '.' in line and not line.startswith('.'):
+            # Potrebbe essere un file specifico
+            ignore_exts.add(f".{line.rpartition('.')[2]}")
+        elif line.startswith('.'):
+            ignore_dirs.add(line)
+
+    return frozenset(ignore_dirs), frozenset(ignore_exts), frozenset(ignore_patterns)
 
 
 def load_crickignore_rules(project_root: str) -> Tuple[Set[str], Set[str], Set[str]]:
@@ -16,36 +51,39 @@ def load_crickignore_rules(project_root: str) -> Tuple[Set[str], Set[str], Set[s
         Tuple di (ignore_dirs, ignore_exts, ignore_patterns).
     """
     crickignore_path = os.path.join(project_root, ".crick", ".crickignore")
-    if not os.path.exists(crickignore_path):
+    try:
+        st = os.stat(crickignore_path)
+    except FileNotFoundError:
         return set(), set(), set()
 
-    ignore_dirs = set()
-    ignore_exts = set()
-    ignore_patterns = set()  # Pattern completi (es. ".crick/")
+    ignore_dirs, ignore_exts, ignore_patterns = _parse_crickignore(crickignore_path, st.st_mtime_ns, st.st_size)
+    # Copie: il risultato in cache resta immutabile
+    return set(ignore_dirs), set(ignore_exts), set(ignore_patterns)
+
+
+def compile_ignore_matcher(ignore_dirs: Iterable[str], ignore_exts: Iterable[str]) -> Callable[[List[str]], List[bool]]:
+    """
+    Compila le regole in un matcher bulk per il walk del progetto.
+
+    Il matcher riceve path relativi ("/" come separatore) e restituisce una maschera
+    booleana (True = da ignorare): directory ignorate o nascoste, file nascosti ed
+    estensioni vietate. Le estensioni diventano una tupla per un solo str.endswith
+    in C invece di un any() per path.
+    """
+    dirs = frozenset(ignore_dirs)
+    exts = tuple(ignore_exts)
+
+    def _ignored(rel_path: str) -> bool:
+        head, _, name = rel_path.rpartition("/")
+        if name.startswith(".") or (exts and name.endswith(exts)):
+            return True
+        if head:
+            for part in head.split("/"):
+                if part in dirs or (part.startswith(".") and part != "."):
+                    return True
+        return False
+
+    def match(paths: List[str]) -> List[bool]:
+        return [_ignored(p) for p in paths]
 
-    with open(crickignore_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            # Salta commenti e linee vuote
-            if not line or line.startswith('#'):
-                continue
-
-            # Aggiungi il pattern originale
-            ignore_patterns.add(line)
-
-            # Rimuove il trailing slash per le directory
-            if line.endswith('/'):
-                dir_name = line.rstrip('/')
-                ignore_dirs.add(dir_name)
-            # Estensioni di file (es. *.pyc)
-            elif line.startswith('*.'):
-                ext = line[1:]  # Rimuove l'asterisco
-                ignore_exts.add(ext)
-            # Nomi di file specifici
-            elif '.' in line and not line.startswith('.'):
-                # Potrebbe essere un file specifico
-                ignore_exts.add(f".{line.split('.')[-1]}")
-            elif line.startswith('.'):
-                ignore_dirs.add(line)
-
-    return ignore_dirs, ignore_exts, ignore_patterns
\ No newline at end of file
+    return match
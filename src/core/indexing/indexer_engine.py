@@ -1,28 +1,64 @@
 import os
 import hashlib
-import json
+import mmap
+import orjson
 import pathspec
 import time
 import threading
-from typing import Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 
 # --- Agno Imports ---
 from agno.knowledge import Knowledge
 from agno.vectordb.lancedb import LanceDb, SearchType
-from src.core.storage.embedder import get_shared_embedder
+from src.core.storage.embedder import get_shared_embedder, EMBED_BATCH
 
 # --- Chunking Imports ---
-from langchain_text_splitters import RecursiveCharacterTextSplitter, Language
 from langchain_core.documents import Document
+from src.core.indexing.chunker import AdaptiveChunker
 
 # Configurazione Crick (opzionale)
-from src.core.indexing.ignore import load_crickignore_rules
+from src.core.indexing.ignore import load_crickignore_rules, compile_ignore_matcher
+
+# Scansione disco: thread per overlap di open/read/sha256, a blocchi per limitare la memoria
+SCAN_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+SCAN_BATCH_SIZE = 1024
+# Estensioni sicuramente binarie (immagini, archivi, font, media, compilati): scartate senza I/O.
+# Denylist e non allowlist: i linguaggi fuori da AdaptiveChunker.LANG_MAP (.vue, .kt, .cs, ...) restano indicizzati.
+_BINARY_EXTS = (
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".icns", ".webp", ".tif", ".tiff", ".psd",
+    ".zip", ".tar", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".jar", ".war", ".whl",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot",
+    ".mp3", ".mp4", ".wav", ".ogg", ".flac", ".mov", ".avi", ".mkv", ".webm",
+    ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+    ".exe", ".dll", ".so", ".dylib", ".a", ".lib", ".o", ".obj", ".class", ".pyc", ".pyd", ".wasm",
+    ".db", ".sqlite", ".sqlite3", ".bin", ".dat", ".lance",
+)
+KNOWN_BINARY_EXTS = frozenset(_BINARY_EXTS) | frozenset(e.upper() for e in _BINARY_EXTS)
+# Oltre questa soglia (bundle minificati, dump, lockfile giganti) il file non viene nemmeno letto
+MAX_INDEX_FILE_BYTES = 10 * 1024 * 1024
+# Scrittura LanceDB a lotti tra file diversi: flush ogni N chunk o ~4M caratteri
+# (multiplo di EMBED_BATCH, così ogni flush riempie batch completi dell'embedder)
+ADD_BATCH_CHUNKS = max(1, 256 // EMBED_BATCH) * EMBED_BATCH
+ADD_BATCH_CHARS = 4 * 1024 * 1024
+# Oltre questa dimensione la lettura passa da mmap (file LF-only): niente copia intermedia in bytes
+MMAP_MIN_BYTES = 1 << 20
+# Indice IVF-PQ: rebuild solo oltre N chunk modificati dall'ultimo build, o se più vecchio di 24h
+INDEX_REBUILD_MIN_CHANGES = 1000
+INDEX_REBUILD_MAX_AGE_S = 24 * 3600
+# Cancellazioni batch: id per espressione "IN (...)"
+DELETE_BATCH_SIZE = 1000
+# Pulizia chunk obsoleti: fino a N path la scansione è pre-filtrata in LanceDB (payload LIKE)
+STALE_FILTER_MAX_PATHS = 32
+# Stat cache: file modificati negli ultimi 2s non vengono memorizzati (granularità mtime)
+STAT_CACHE_RACY_NS = 2_000_000_000
 
 class UniversalCodeIndexer:
     def __init__(self, db_path: str, table_name: str):
         self.db_path = db_path
         self.table_name = table_name
-        self._lock = threading.RLock()  # Lock per sincronizzare accessi al database
+        # Lock solo sulle mutazioni del DB (delete + add_contents); lettura e chunking restano paralleli
+        self._write_lock = threading.Lock()
         
         # -----------------------------------------------------------
         # 1. CONFIGURAZIONE ADATTIVA
@@ -57,117 +93,97 @@ class UniversalCodeIndexer:
         # -----------------------------------------------------------
         # 4. CHUNKING TOOLS (Per file > 15k caratteri)
         # -----------------------------------------------------------
-        self.LANG_MAP = {
-            ".py": Language.PYTHON,
-            ".js": Language.JS,
-            ".jsx": Language.JS,
-            ".ts": Language.TS, 
-            ".tsx": Language.TS,
-            ".java": Language.JAVA,
-            ".go": Language.GO,
-            ".rs": Language.RUST,
-            ".cpp": Language.CPP, 
-            ".c": Language.CPP,
-            ".php": Language.PHP,
-            ".html": Language.HTML,
-            ".css": Language.HTML
-        }
-
-        self.fallback_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=4000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ">", " ", ""]
-        )
-
-    def _get_splitter(self, filename: str):
-        """Helper per scegliere lo splitter corretto."""
-        ext = os.path.splitext(filename)[1].lower()
-        if ext in self.LANG_MAP:
-            return RecursiveCharacterTextSplitter.from_language(
-                language=self.LANG_MAP[ext],
-                chunk_size=30000,
-                chunk_overlap=2000
-            )
-        return self.fallback_splitter
+        # Un solo chunker per upsert_file (chunk_content) e sync (chunk_many): stessi chunk in entrambi i percorsi
+        self.chunker = AdaptiveChunker(small_file_threshold=self.SMALL_FILE_THRESHOLD)
+        # (versione tabella, path -> hash): evita di riparsare tutti i payload se il DB non è cambiato
+        self._db_state_cache: Optional[Tuple[int, Dict[str, str]]] = None
 
     # ==========================================
     # 1. CORE LOGIC (ADAPTIVE UPSERT)
     # ==========================================
     
-    def upsert_file(self, full_path: str, root_dir: str, verbose=True):
-        # 1. Skip binari
-        if self._is_binary_file(full_path): return
+    def upsert_file(self, full_path: str, root_dir: str, verbose=True, content: Optional[str] = None, content_hash: Optional[str] = None, expected_hash: Optional[str] = None):
+        # 1. Lettura unica in bytes (skip binari/illeggibili); saltata se il contenuto arriva dalla scansione
+        if content is None:
+            read = self._read_text_and_hash(full_path)
+            if read is None: return
+            content, content_hash = read
 
-        with self._lock:
-            try:
-                # 2. Calcolo Path Relativo Standardizzato
-                rel_path = os.path.relpath(full_path, root_dir).replace("\\", "/")
-                if rel_path.startswith("./"): rel_path = rel_path[2:]
-            
-                # 3. Lettura Sicura (Text Mode + UTF-8 + Ignore Errors)
-                try:
-                    with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-                        content = f.read()
-                except Exception:
-                    return # File illeggibile o lockato
-            
-                if not content.strip(): return 
-
-                # 4. Calcolo Hash SHA256 (Coerente con Watcher)
-                current_hash = self._compute_content_hash(content)
-                file_len = len(content)
-
-                # 5. Logica Chunking Adattiva
-                docs = []
-                if file_len < self.SMALL_FILE_THRESHOLD:
-                    # File piccolo -> 1 Chunk unico
-                    docs = [Document(page_content=content)]
-                    if verbose: print(f">> [UPSERT] {rel_path} (Intero: {file_len} chars)")
-                else:
-                    # File grande -> Split Intelligente
-                    splitter = self._get_splitter(rel_path)
-                    try: 
-                        docs = splitter.create_documents([content])
-                    except Exception: 
-                        docs = self.fallback_splitter.create_documents([content])
-                    if verbose: print(f">> [UPSERT] {rel_path} (Chunked: {len(docs)} parts)")
-
-                # 6. Pulizia Preventiva (Cruciale per evitare chunk orfani)
-                # Se prima il file aveva 5 chunk e ora ne ha 3, dobbiamo rimuovere i vecchi 5.
-                self.delete_file(full_path, root_dir, verbose=False)
+        # Short-circuit: hash già presente nel DB (expected_hash) -> niente delete, chunking né embedding
+        if expected_hash is not None:
+            if (content_hash or self._compute_content_hash(content)) == expected_hash: return
 
-                # 7. Preparazione Payload per Agno
-                contents_to_add = []
-                for idx, doc in enumerate(docs):
-                    chunk_text = doc.page_content
-                    
-                    # Formattazione XML-style per aiutare l'LLM a capire dove inizia/finisce il file
-                    rag_content = self._format_repomix_style(rel_path, chunk_text)
-                    
-                    # ID Univoco Stabile (basato su path e indice)
-                    chunk_id = f"{rel_path}#{idx}"
-
-                    contents_to_add.append({
-                        "name": chunk_id,          # Agno userà questo per generare il suo ID interno
-                        "text_content": rag_content,
-                        "metadata": {
-                            "path": rel_path,
-                            "hash": current_hash,
-                            "chunk_index": idx,
-                            "total_chunks": len(docs),
-                            "is_whole_file": len(docs) == 1,
-                            "last_modified": time.time() 
-                        },
-                        "upsert": True,            # Sovrascrive se l'ID esiste
-                        "skip_if_exists": False    # Forza l'aggiornamento (perché sappiamo che è cambiato)
-                    })
-
-                # 8. Scrittura Batch nel DB
-                if contents_to_add:
-                    self.knowledge.add_contents(contents_to_add)
+        try:
+            # 2. Calcolo Path Relativo Standardizzato
+            rel_path = os.path.relpath(full_path, root_dir).replace("\\", "/")
+            if rel_path.startswith("./"): rel_path = rel_path[2:]
+        
+            if not content.strip(): return 
 
-            except Exception as e:
-              print(f"[ERROR] {rel_path if 'rel_path' in locals() else full_path}: {e}")
+            # 4. Calcolo Hash SHA256 (Coerente con Watcher)
+            current_hash = content_hash or self._compute_content_hash(content)
+
+            # 5. Chunking + payload (fuori dal lock: CPU pura, nessun accesso al DB)
+            contents_to_add = self._prepare_chunks(rel_path, content, current_hash, verbose=verbose)
+
+            with self._write_lock:
+                if not contents_to_add:
+                    self.delete_file(full_path, root_dir, verbose=False)
+                    return
+
+                # 6. Scrittura Batch nel DB (prima la nuova versione: se fallisce resta cercabile la vecchia)
+                self.knowledge.add_contents(contents_to_add)
+
+                # 7. Pulizia dei chunk della versione precedente (Cruciale per evitare chunk orfani)
+                # Se prima il file aveva 5 chunk e ora ne ha 3, dobbiamo rimuovere i vecchi 5.
+                # Scansione filtrata sul solo rel_path (payload LIKE), non sull'intera tabella.
+                try:
+                    self._delete_stale_chunks({rel_path: current_hash})
+                except Exception as e:
+                    print(f"[DELETE ERROR] {rel_path}: {e}")
+
+        except Exception as e:
+          print(f"[ERROR] {rel_path if 'rel_path' in locals() else full_path}: {e}")
+
+    def _prepare_chunks(self, rel_path: str, content: str, current_hash: str, verbose=False) -> List[dict]:
+        """Chunking adattivo + payload Agno per un file (nessun accesso al DB)."""
+        # Logica Chunking Adattiva: file piccolo -> 1 chunk unico, file grande -> split intelligente
+        docs = self.chunker.chunk_content(content, rel_path)
+        if verbose:
+            if len(content) < self.SMALL_FILE_THRESHOLD:
+                print(f">> [UPSERT] {rel_path} (Intero: {len(content)} chars)")
+            else:
+                print(f">> [UPSERT] {rel_path} (Chunked: {len(docs)} parts)")
+        return self._build_payloads(rel_path, docs, current_hash)
+
+    def _build_payloads(self, rel_path: str, docs: List[Document], current_hash: str) -> List[dict]:
+        """Payload Agno per i chunk di un file (nessun accesso al DB)."""
+        # Preparazione Payload per Agno
+        # Invarianti per file calcolati una volta: cornice repomix, numero di chunk, prefisso id
+        header, footer = self._repomix_frame(rel_path)
+        total = len(docs)
+        is_whole_file = total == 1
+        id_prefix = rel_path + "#"
+
+        contents_to_add = []
+        for idx, doc in enumerate(docs):
+            contents_to_add.append({
+                "name": id_prefix + str(idx),   # ID Univoco Stabile (path#indice): Agno lo usa per il suo ID interno
+                # Formattazione XML-style per aiutare l'LLM a capire dove inizia/finisce il file
+                "text_content": header + doc.page_content + footer,
+                "metadata": {
+                    "path": rel_path,
+                    "hash": current_hash,
+                    "chunk_index": idx,
+                    "total_chunks": total,
+                    "is_whole_file": is_whole_file
+                    # Niente timestamp: metadati deterministici dato il contenuto (hash identifica la versione)
+                },
+                "upsert": True,            # Sovrascrive se l'ID esiste
+                "skip_if_exists": False    # Forza l'aggiornamento (perché sappiamo che è cambiato)
+            })
+
+        return contents_to_add
 
     def delete_file(self, full_path: str, root_dir: str, verbose=True):
         """Cancella tutti i chunk associati a un file usando i metadati."""
@@ -191,12 +207,88 @@ class UniversalCodeIndexer:
             if "Table not initialized" in str(e): return
             print(f"[DELETE ERROR] {e}")
 
+    def delete_files(self, rel_paths: List[str], root_dir: str):
+        """
+        Cancella i chunk di più file con un'unica transazione: una scansione id+payload
+        e un solo tbl.delete("id IN (...)"), invece di un delete_by_metadata per file.
+        Se la tabella non è accessibile direttamente ricade su delete_file per ciascun path.
+        """
+        paths = set(rel_paths)
+        try:
+            with self._write_lock:
+                self._delete_chunks_where(lambda meta: meta.get("path") in paths)
+        except Exception as e:
+            print(f"[DELETE BATCH] Fallback per file: {e}")
+            with self._write_lock:
+                for p in rel_paths:
+                    self.delete_file(os.path.join(root_dir, p), root_dir, verbose=False)
+
+    def _delete_stale_chunks(self, current_hashes: Dict[str, str]) -> int:
+        """
+        Dopo la scrittura delle nuove versioni: rimuove i chunk dei path indicati il cui hash
+        non è quello corrente. Va chiamata con _write_lock acquisito.
+        Per pochi path la scansione è pre-filtrata in LanceDB sul testo del payload.
+        """
+        def is_stale(meta):
+            current = current_hashes.get(meta.get("path"))
+            return current is not None and meta.get("hash") != current
+        return self._delete_chunks_where(is_stale, where=self._payload_path_filter(current_hashes))
+
+    @staticmethod
+    def _payload_path_filter(paths) -> Optional[str]:
+        """
+        Filtro SQL grossolano (payload LIKE '%"<path>"%') per restringere la scansione ai chunk
+        di pochi path; il match esatto resta in Python. None = scansione completa (troppi path,
+        o path che nel JSON del payload contengono escape, incompatibili con LIKE).
+        """
+        if not paths or len(paths) > STALE_FILTER_MAX_PATHS: return None
+        clauses = []
+        for path in paths:
+            fragment = orjson.dumps(path).decode()
+            if "\\" in fragment or not fragment.isascii(): return None
+            clauses.append("payload LIKE '%" + fragment.replace("'", "''") + "%'")
+        return " OR ".join(clauses)
+
+    def _delete_chunks_where(self, match, where: Optional[str] = None) -> int:
+        """Una scansione id+payload (opzionalmente pre-filtrata), poi tbl.delete per id a blocchi. Ritorna le righe rimosse."""
+        if not self.vector_db.exists() or self.vector_db.table is None: return 0
+        tbl = self.vector_db.table
+        id_col = getattr(self.vector_db, "_id", "id")
+
+        query = tbl.search()
+        if where:
+            query = query.where(where)
+        data = query.select([id_col, "payload"]).limit(None).to_arrow()
+        ids = []
+        loads = orjson.loads
+        for chunk_id, payload_raw in zip(data.column(id_col).to_pylist(), data.column("payload").to_pylist()):
+            try:
+                payload = loads(payload_raw) if isinstance(payload_raw, (str, bytes)) else payload_raw
+                if payload and match(payload.get("meta_data", {})):
+                    ids.append(chunk_id)
+            except Exception:
+                continue
+
+        # Filtro SQL a blocchi per non generare espressioni enormi
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            in_list = ", ".join("'" + str(i).replace("'", "''") + "'" for i in ids[start:start + DELETE_BATCH_SIZE])
+            tbl.delete(f"{id_col} IN ({in_list})")
+        return len(ids)
+
     # ==========================================
     # 2. INDICI & SYNC
     # ==========================================
 
-    def create_hybrid_indexes(self):
-        """Ricostruisce gli indici accedendo alla proprietà .table di LanceDb."""
+    def create_hybrid_indexes(self, changed_rows: Optional[int] = None):
+        """
+        Ricostruisce gli indici accedendo alla proprietà .table di LanceDb.
+        changed_rows: chunk scritti/rimossi dall'ultima sync (None = sconosciuto -> rebuild completo).
+        L'FTS (tantivy, non incrementale) va rifatto ad ogni modifica; l'IVF-PQ viene rifatto solo
+        quando le modifiche accumulate superano INDEX_REBUILD_MIN_CHANGES o è più vecchio di
+        INDEX_REBUILD_MAX_AGE_S: le righe non ancora indicizzate restano comunque cercabili (scan flat).
+        """
+        if changed_rows == 0:
+            return
         try:
             # Controllo esistenza tramite wrapper
             if not self.vector_db.exists() or self.vector_db.table is None:
@@ -216,8 +308,19 @@ class UniversalCodeIndexer:
             except Exception as e: 
                 print(f"[WARN] FTS Skip: {e}")
 
-            # Indice Vettoriale (IVF-PQ)
-            if row_count > 2000:
+            # Indice Vettoriale (IVF-PQ), coalescente tra sync successive
+            index_state = self._load_index_state()
+            pending_changes = index_state.get("pending_changes", 0) + (changed_rows or 0)
+            rebuild_vector = (
+                changed_rows is None
+                or "built_at" not in index_state
+                or pending_changes > INDEX_REBUILD_MIN_CHANGES
+                or time.time() - index_state["built_at"] > INDEX_REBUILD_MAX_AGE_S
+            )
+            if row_count > 2000 and not rebuild_vector:
+                print(f"[INFO]  Vector Index rimandato ({pending_changes} modifiche pendenti).")
+                self._save_index_state({**index_state, "pending_changes": pending_changes})
+            elif row_count > 2000:
                 import math
                 partitions = 2 ** int(math.log2(row_count / 20))
                 partitions = max(2, min(256, partitions))
@@ -233,17 +336,38 @@ class UniversalCodeIndexer:
                     replace=True
                 )
                 print("[OK] Vector Index ottimizzato.")
+                self._save_index_state({"built_at": time.time(), "row_count": row_count, "pending_changes": 0})
             
         except Exception as e:
             print(f"[WARN]  Manutenzione indici fallita: {e}")
 
+    def _index_state_path(self) -> str:
+        return os.path.join(self.db_path, f".index_state_{self.table_name}.json")
+
+    def _load_index_state(self) -> dict:
+        try:
+            with open(self._index_state_path(), "rb") as f:
+                return orjson.loads(f.read())
+        except Exception:
+            return {}
+
+    def _save_index_state(self, state: dict):
+        try:
+            with open(self._index_state_path(), "wb") as f:
+                f.write(orjson.dumps(state))
+        except Exception as e:
+            print(f"[WARN] Stato indici non salvato: {e}")
+
     def sync_project(self, root_dir: str):
         """Scansiona la cartella e aggiorna il DB (CON DEBUG)."""
         print(f"[SYNC] Avvio analisi su: {root_dir}")
         
-        # 1. Recupero stati
-        disk_files = self._scan_disk_hashes(root_dir)
-        db_state = self._get_db_state() 
+        # 1. Recupero stati in parallelo: lettura DB in background mentre la scansione fa il walk.
+        # La scansione attende lo stato DB solo per decidere quali contenuti tenere in memoria.
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            db_future = pool.submit(self._get_db_state)
+            disk_files, changed_contents = self._scan_disk_hashes(root_dir, known_hashes=db_future)
+            db_state = db_future.result()
 
         # DEBUG: Stato generale
         print(f"[DEBUG STATS] Files su Disco: {len(disk_files)} | Files nel DB: {len(db_state)}")
@@ -280,27 +404,90 @@ class UniversalCodeIndexer:
 
         print(f"[SYNC] Rilevati: +{len(to_upsert)} Upsert, -{len(to_delete)} Delete.")
         
-        # Esecuzione Cancellazioni
-        for p in to_delete:
-            self.delete_file(os.path.join(root_dir, p), root_dir, verbose=False)
+        # Esecuzione Cancellazioni (un solo delete LanceDB per tutti i file rimossi)
+        if to_delete:
+            self.delete_files(to_delete, root_dir)
             
-        # Esecuzione Inserimenti
-        for i, p in enumerate(to_upsert, 1):
-            print(f"   >> Processing [{i}/{len(to_upsert)}]: {p}", end="\r")
-            self.upsert_file(os.path.join(root_dir, p), root_dir, verbose=False)
+        # Esecuzione Inserimenti: lettura in parallelo, chunking a blocchi (chunk_many), chunk di più file in un'unica add_contents
+        def prepare(p):
+            content, content_hash = changed_contents.pop(p, None), disk_files[p]
+            if content is None:
+                read = self._read_text_and_hash(os.path.join(root_dir, p))
+                if read is None: return p, None, None
+                content, content_hash = read
+            # Vuoto, oppure tornato identico al DB: nessuna scrittura (come upsert_file)
+            if not content.strip() or content_hash == db_state.get(p): return p, None, None
+            return p, content, content_hash
+
+        pending: List[dict] = []
+        pending_chars = 0
+        # File già indicizzati (in db_state) del batch corrente -> hash appena scritto
+        pending_hashes: Dict[str, str] = {}
+        # Stessa mappa per tutti i batch scritti con successo: i loro chunk con hash diverso sono obsoleti
+        written_hashes: Dict[str, str] = {}
+        # Righe toccate (per decidere se rifare l'indice vettoriale)
+        changed_rows = len(to_delete)
+
+        def flush():
+            nonlocal pending, pending_chars, pending_hashes, changed_rows
+            if not pending: return
+            try:
+                # Solo scrittura: le vecchie versioni restano finché la nuova non è nel DB, così se
+                # add_contents fallisce (timeout embedder, rate limit, crash) la precedente resta cercabile
+                with self._write_lock:
+                    self.knowledge.add_contents(pending)
+                changed_rows += len(pending)
+                written_hashes.update(pending_hashes)
+            except Exception as e:
+                # I file del batch mantengono la versione precedente: la prossima sync li rileva come MOD
+                print(f"\n[ERROR] Batch di {len(pending)} chunk non scritto: {e}")
+            pending, pending_chars, pending_hashes = [], 0, {}
+
+        with ThreadPoolExecutor(max_workers=SCAN_MAX_WORKERS) as pool:
+            for start in range(0, len(to_upsert), SCAN_BATCH_SIZE):
+                block = to_upsert[start:start + SCAN_BATCH_SIZE]
+                ready = [r for r in pool.map(prepare, block) if r[1] is not None]
+                # Un create_documents per splitter sull'intero blocco invece di uno per file
+                docs_per_file = self.chunker.chunk_many([(content, p) for p, content, _ in ready])
+                for i, ((p, _, content_hash), docs) in enumerate(zip(ready, docs_per_file), start + 1):
+                    print(f"   >> Processing [{i}/{len(to_upsert)}]: {p}", end="\r")
+                    chunks = self._build_payloads(p, docs, content_hash)
+                    # I file NEW non hanno chunk vecchi: niente passata di pulizia per loro
+                    if p in db_state:
+                        pending_hashes[p] = content_hash
+                    pending.extend(chunks)
+                    pending_chars += sum(len(c["text_content"]) for c in chunks)
+                    if len(pending) >= ADD_BATCH_CHUNKS or pending_chars >= ADD_BATCH_CHARS:
+                        flush()
+        flush()
+
+        # Un'unica passata di pulizia dopo l'ultimo flush, solo per i file modificati scritti davvero
+        if written_hashes:
+            try:
+                with self._write_lock:
+                    changed_rows += self._delete_stale_chunks(written_hashes)
+            except Exception as e:
+                # Restano duplicati vecchi: lo stato DB non combacia e la prossima sync li riscrive
+                print(f"\n[WARN] Chunk obsoleti non rimossi: {e}")
             
         print(f"\n[SYNC] Completato. Total files in vector database: {len(self._get_db_state())}")
-        self.create_hybrid_indexes()
+        self.create_hybrid_indexes(changed_rows=changed_rows)
 
     # ==========================================
     # 3. HELPER PRIVATI
     # ==========================================
     
-    def _scan_disk_hashes(self, root_dir) -> Dict[str, str]:
+    def _scan_disk_hashes(self, root_dir, known_hashes: Union[Dict[str, str], "Future[Dict[str, str]]", None] = None) -> Tuple[Dict[str, str], Dict[str, str]]:
         """
         Scansiona il disco. CORRETTO per ignorare estensioni .crickignore.
+        Ogni file viene letto una sola volta: ritorna (path -> hash, path -> contenuto) dove
+        il contenuto è conservato solo per i file con hash diverso da known_hashes
+        (anche un Future, risolto solo quando serve il primo confronto).
         """
         files_map = {}
+        contents: Dict[str, str] = {}
+        if known_hashes is None:
+            known_hashes = {}
         
         # 1. Carichiamo sia directory CHE estensioni
         try: 
@@ -317,33 +504,123 @@ class UniversalCodeIndexer:
                      ignore_spec = pathspec.PathSpec.from_lines("gitwildmatch", f)
              except: pass
 
-        for root, dirs, files in os.walk(root_dir):
-            # Filtra le directory ignorate (es. node_modules)
-            dirs[:] = [d for d in dirs if d not in ignore_dirs and not d.startswith(".")]
-            
-            for file in files:
-                if file.startswith("."): continue
-                
-                # --- FIX ESTENSIONI ---
-                # Controlla se il file finisce con una delle estensioni vietate
-                if any(file.endswith(ext) for ext in ignore_exts):
+        # Nomi nascosti + estensioni vietate valutati in blocco per directory.
+        # Le estensioni binarie note si scartano qui, senza aprire il file per il controllo NUL.
+        is_ignored = compile_ignore_matcher(ignore_dirs, set(ignore_exts) | KNOWN_BINARY_EXTS)
+
+        # 2. Walk (thread chiamante): solo filtri, nessuna lettura.
+        # scandir con stack esplicito: DirEntry porta tipo (e su Windows anche stat) già in cache,
+        # il path relativo viene portato avanti come prefisso invece di un relpath per file.
+        candidates = []
+        match_file = ignore_spec.match_file if ignore_spec else None
+        stack = [(root_dir, "")]
+        while stack:
+            dir_path, rel_prefix = stack.pop()
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = list(it)
+            except OSError:
+                continue # Directory illeggibile (come os.walk senza onerror)
+
+            files = []
+            for entry in entries:
+                name = entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    files.append(entry)
                     continue
-                # ----------------------
-
-                full_path = os.path.join(root, file)
-                rel_path = os.path.relpath(full_path, root_dir).replace("\\", "/")
-                if rel_path.startswith("./"): rel_path = rel_path[2:]
-
-                if ignore_spec and ignore_spec.match_file(rel_path): continue
-                if self._is_binary_file(full_path): continue
+                # Come os.walk(followlinks=False): i symlink a directory non vengono seguiti
+                if entry.is_symlink(): continue
+                # Filtra le directory ignorate (es. node_modules)
+                if name in ignore_dirs or name.startswith("."): continue
+                # .gitignore a livello directory: l'intero sottoalbero viene saltato senza match per file
+                # (come git: un file dentro una directory esclusa non può essere re-incluso)
+                if match_file and match_file(f"{rel_prefix}{name}/"): continue
+                stack.append((entry.path, f"{rel_prefix}{name}/"))
+
+            for entry, skip in zip(files, is_ignored([e.name for e in files])):
+                if skip: continue
+
+                rel_path = rel_prefix + entry.name
+                if match_file and match_file(rel_path): continue
+                candidates.append((rel_path, entry))
+
+        # 3. Lettura + hash in parallelo (I/O bound; sha256 rilascia il GIL)
+        # Stat cache (come l'index di git): stesso mtime+size dell'ultima scansione -> hash riusato senza leggere
+        old_stat_cache = self._load_stat_cache(root_dir)
+        new_stat_cache: Dict[str, list] = {}
+        # File modificati negli ultimi secondi: mtime non affidabile (stesso tick), non si mettono in cache
+        racy_after_ns = time.time_ns() - STAT_CACHE_RACY_NS
+
+        def read_and_hash(item):
+            rel_path, entry = item
+            full_path = entry.path
+            known = None
+            try:
+                # Cache del DirEntry: gratis su Windows, una sola stat (nel worker) altrove
+                st = entry.stat()
+            except OSError:
+                return None
+            cached = old_stat_cache.get(rel_path)
+            if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                new_stat_cache[rel_path] = cached
+                if cached[2] is None: return None # Binario/troppo grande, invariato
+                known = known_hashes.result() if isinstance(known_hashes, Future) else known_hashes
+                # Invariato su disco E già nel DB: nessuna lettura
+                if known.get(rel_path) == cached[2]: return rel_path, cached[2], None
+
+            read = self._read_text_and_hash(full_path)
+            if st.st_mtime_ns < racy_after_ns:
+                new_stat_cache[rel_path] = [st.st_mtime_ns, st.st_size, read[1] if read else None]
+            if read is None: return None
+            content, file_hash = read
+            # Il contenuto dei file invariati viene scartato subito nel worker
+            if known is None:
+                known = known_hashes.result() if isinstance(known_hashes, Future) else known_hashes
+            return rel_path, file_hash, (content if known.get(rel_path) != file_hash else None)
+
+        with ThreadPoolExecutor(max_workers=SCAN_MAX_WORKERS) as pool:
+            # Sottomissione a blocchi per limitare i future in volo su repo enormi
+            for start in range(0, len(candidates), SCAN_BATCH_SIZE):
+                for result in pool.map(read_and_hash, candidates[start:start + SCAN_BATCH_SIZE]):
+                    if result is None: continue
+                    rel_path, file_hash, content = result
+                    files_map[rel_path] = file_hash
+                    if content is not None:
+                        contents[rel_path] = content
+
+        # Riscritta ad ogni scansione: contiene solo i file ancora presenti
+        self._save_stat_cache(root_dir, new_stat_cache)
+        return files_map, contents
+
+    def _stat_cache_path(self) -> str:
+        return os.path.join(self.db_path, f".stat_cache_{self.table_name}.json")
+
+    def _load_stat_cache(self, root_dir: str) -> Dict[str, list]:
+        """Legge la stat cache {path: [mtime_ns, size, hash]}; vuota se assente, corrotta o di un'altra root."""
+        try:
+            with open(self._stat_cache_path(), "rb") as f:
+                data = orjson.loads(f.read())
+            if data.get("root") != root_dir: return {}
+            return data.get("files", {})
+        except Exception:
+            return {}
 
-                try:
-                    with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-                        content = f.read()
-                        files_map[rel_path] = self._compute_content_hash(content)
-                except: pass
-                
-        return files_map
+    def _save_stat_cache(self, root_dir: str, files: Dict[str, list]):
+        path = self._stat_cache_path()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.db_path, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps({"root": root_dir, "files": files}))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[WARN] Stat cache non salvata: {e}")
+            try: os.remove(tmp_path)
+            except OSError: pass
 
     def _get_db_state(self) -> Dict[str, str]:
     
@@ -359,20 +636,27 @@ class UniversalCodeIndexer:
             
             if tbl.count_rows() == 0: return {}
 
-            # Scarica solo payload
+            # Ogni scrittura LanceDB crea una nuova versione: stessa versione -> stesso stato
             try:
-                df = tbl.search().select(["payload"]).limit(None).to_pandas()
+                version = tbl.version
             except Exception:
-                return {}
+                version = None
+            cached = self._db_state_cache
+            if version is not None and cached is not None and cached[0] == version:
+                return dict(cached[1])
 
-            if df.empty: return {}
+            # Scarica solo la colonna payload come Arrow (niente DataFrame / iterrows)
+            try:
+                payloads = tbl.search().select(["payload"]).limit(None).to_arrow().column("payload").to_pylist()
+            except Exception:
+                return {}
 
             # Parsing del payload JSON
-            for _, row in df.iterrows():
+            loads = orjson.loads
+            for payload_raw in payloads:
                 try:
-                    payload_raw = row["payload"]
                     # Deserializza se è stringa
-                    payload = json.loads(payload_raw) if isinstance(payload_raw, str) else payload_raw
+                    payload = loads(payload_raw) if isinstance(payload_raw, (str, bytes)) else payload_raw
                     
                     if not payload: continue
                     
@@ -389,20 +673,65 @@ class UniversalCodeIndexer:
                 except Exception:
                     continue
 
-            return state
+            if version is not None:
+                self._db_state_cache = (version, state)
+            return dict(state)
 
         except Exception as e:
             print(f"[DB READ ERROR] {e}")
             return {}
 
-    def _is_binary_file(self, filepath):
+    def _read_text_and_hash(self, full_path: str) -> Optional[Tuple[str, str]]:
+        """
+        Legge il file una sola volta in bytes: controllo binario, normalizzazione LF e hash
+        lavorano sui bytes; il testo viene decodificato una volta sola per lo splitter.
+        Ritorna (contenuto, hash) oppure None se binario o illeggibile.
+        """
+        try:
+            with open(full_path, "rb") as f:
+                # fstat sul descrittore già aperto: niente stat separato sul path
+                size = os.fstat(f.fileno()).st_size
+                if size > MAX_INDEX_FILE_BYTES: return None
+                if size > MMAP_MIN_BYTES:
+                    fast = self._read_mapped_lf_only(f)
+                    if fast is not None: return fast or None
+                data = f.read()
+        except Exception:
+            return None # File illeggibile o lockato
+        if b"\0" in data[:1024]: return None
+
+        # Stessa normalizzazione del text mode (universal newlines)
+        normalized = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
         try:
-            with open(filepath, 'rb') as f: return b'\0' in f.read(1024)
-        except: return True
+            # UTF-8 valido: i byte normalizzati SONO l'encoding del testo -> hash diretto, niente re-encode
+            return normalized.decode("utf-8"), hashlib.sha256(normalized).hexdigest()
+        except UnicodeDecodeError:
+            content = data.decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+            return content, self._compute_content_hash(content)
 
-    def _format_repomix_style(self, path, content):
+    def _read_mapped_lf_only(self, f) -> Optional[Tuple[str, str]]:
+        """
+        Fast path per file grandi: mmap in sola lettura, hash e decodifica direttamente dalla
+        page cache senza la copia in un bytes. Vale solo per file già LF-only (nessun \\r):
+        la normalizzazione è un no-op. Ritorna () se binario, None se serve il percorso normale.
+        """
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(b"\0", 0, 1024) != -1: return ()
+            if mm.find(b"\r") != -1: return None
+            try:
+                content = str(mm, "utf-8")
+            except UnicodeDecodeError:
+                return None
+            return content, hashlib.sha256(mm).hexdigest()
+
+    def _repomix_frame(self, path) -> Tuple[str, str]:
+        """Apertura/chiusura del tag <file> (uguale per tutti i chunk di un file)."""
         ext = os.path.splitext(path)[1]
-        return f"""<file path="{path}" extension="{ext}">\n{content}\n</file>"""
+        return f"""<file path="{path}" extension="{ext}">\n""", "\n</file>"
+
+    def _format_repomix_style(self, path, content):
+        header, footer = self._repomix_frame(path)
+        return header + content + footer
     
     def get_stored_hash(self, rel_path: str) -> Optional[str]:
         """
@@ -1,20 +1,26 @@
 import asyncio
+import hashlib
 import os
+import threading
 import shutil
 import zipfile
-import glob
+from concurrent.futures import ThreadPoolExecutor
 import time
-import json
+import orjson
 import logging
-from typing import AsyncGenerator, Dict, Any, Optional, List
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Dict, Any, Optional, List, Tuple, Union, BinaryIO
 from pydantic import BaseModel, Field
+from bs4 import BeautifulSoup
 
 # --- Agno Imports ---
+from agno.agent import Agent
 from agno.knowledge import Knowledge
 from agno.vectordb.lancedb import LanceDb, SearchType
 from src.core.storage.embedder import get_shared_embedder
 
 # --- Core Imports ---
+from src.core.config.factory_models import build_model_for_runtime, prepare_model_config
 from src.core.indexing.chunker import AdaptiveChunker
 from src.core.indexing.theme_chunker import ThemeChunker
 from src.models import LLMSettings
@@ -22,6 +28,180 @@ from src.prompts.loader import load_prompt
 
 logger = logging.getLogger("TemplateIndexer")
 
+def _link_or_copy(src: str, dst: str) -> str:
+    """copytree copy_function: hard-links freshly extracted files (no data copy), copies across devices."""
+    try:
+        os.link(src, dst)
+        return dst
+    except OSError:
+        return shutil.copy2(src, dst)
+
+# Pagine HTML inviate all'analisi LLM: oltre MAX sono bundle minificati/generati (il prompt
+# tronca comunque a 50k caratteri); oltre SNIFF devono almeno sembrare una pagina vera
+HTML_MAX_BYTES = 512 * 1024
+HTML_SNIFF_MIN_BYTES = 128 * 1024
+
+@dataclass
+class ScannedTemplate:
+    manifests: List[str] = field(default_factory=list)       # full paths, shallowest first
+    previews: List[str] = field(default_factory=list)        # full paths of theme_screen.png, shallowest first
+    html: List[Tuple[str, str]] = field(default_factory=list)  # (full_path, rel_path)
+    skipped_html: List[str] = field(default_factory=list)    # rel paths rejected as oversized/binary
+
+def _is_analyzable_html(path: str, size: int) -> bool:
+    """Cheap pre-filter before the LLM: size cap, NUL sniff, and a page marker check for large files."""
+    if size > HTML_MAX_BYTES:
+        return False
+    try:
+        with open(path, "rb") as f:
+            head = f.read(2048)
+    except OSError:
+        return False
+    if b"\0" in head[:1024]:
+        return False
+    if size >= HTML_SNIFF_MIN_BYTES:
+        head = head.lower()
+        return b"<html" in head or b"<!doctype" in head
+    return True
+
+def _scan_template(root_dir: str) -> ScannedTemplate:
+    """
+    Single os.scandir traversal of an extracted template (each directory listed once).
+    Manifest/preview lookups skip hidden entries, as the recursive glob they replace did.
+    """
+    scanned = ScannedTemplate()
+    manifests, previews = [], []
+    stack = [(root_dir, "", 0, False)]
+    while stack:
+        dir_path, rel_prefix, depth, hidden = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            name = entry.name
+            is_hidden = hidden or name.startswith(".")
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if entry.is_symlink(): continue # Not followed, like os.walk
+                stack.append((entry.path, f"{rel_prefix}{name}/", depth + 1, is_hidden))
+                continue
+            lower = name.lower()
+            if lower.endswith((".html", ".htm")):
+                try:
+                    # Size from the scandir entry's lstat (cached after the first call)
+                    size = entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+                if _is_analyzable_html(entry.path, size):
+                    scanned.html.append((entry.path, rel_prefix + name))
+                else:
+                    scanned.skipped_html.append(rel_prefix + name)
+            if is_hidden:
+                continue
+            if name.endswith(".manifest"):
+                manifests.append((depth, entry.path))
+            elif name == "theme_screen.png":
+                previews.append((depth, entry.path))
+
+    scanned.manifests = [path for _, path in sorted(manifests)]
+    scanned.previews = [path for _, path in sorted(previews)]
+    return scanned
+
+# Estrazione ZIP parallela solo oltre questa soglia di file (sotto, l'overhead del pool non ripaga)
+PARALLEL_EXTRACT_MIN_FILES = 32
+
+def _extract_member(zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo, dest: str) -> None:
+    try:
+        zip_ref.extract(info, dest)
+    except FileExistsError:
+        # Race on a shared parent directory (exists-check + makedirs in zipfile): it now exists
+        zip_ref.extract(info, dest)
+
+def _extract_zip(zip_source: Union[str, BinaryIO], dest: str) -> None:
+    """
+    Extracts the archive into dest. With many entries, members are inflated on a thread pool:
+    ZipFile serializes the raw reads on its shared handle (seek+read under its lock) while
+    zlib decompression and file writes run in parallel outside the GIL. Works for paths and streams.
+    """
+    with zipfile.ZipFile(zip_source, 'r') as zip_ref:
+        infos = zip_ref.infolist()
+        files = [info for info in infos if not info.is_dir()]
+        if len(files) < PARALLEL_EXTRACT_MIN_FILES:
+            zip_ref.extractall(dest)
+            return
+
+        # Directories first (serial), then file contents in parallel
+        for info in infos:
+            if info.is_dir():
+                zip_ref.extract(info, dest)
+        with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+            # list(): surfaces the first extraction error, like extractall
+            list(pool.map(lambda info: _extract_member(zip_ref, info, dest), files))
+
+# Analisi UI (chiamate LLM) in parallelo per template: abbastanza per saturare la latenza,
+# pochi abbastanza da restare nei limiti RPM dei provider
+UI_ANALYSIS_CONCURRENCY = 8
+# Limiti per singola analisi: timeout HTTP, tetto di token in uscita (JSON dei componenti),
+# retry con backoff esponenziale dell'SDK del provider (429 / 5xx / timeout)
+UI_ANALYSIS_TIMEOUT_S = 120.0
+UI_ANALYSIS_MAX_TOKENS = 4096
+UI_ANALYSIS_MAX_RETRIES = 3
+
+# Scrittura dei componenti su LanceDB a lotti durante l'analisi: dimensione adattiva
+# (budget di memoria / dimensione media di uno snippet), limitata a [MIN, MAX] righe
+TEMPLATE_ADD_BATCH_BYTES = 16 * 1024 * 1024
+TEMPLATE_ADD_BATCH_MIN = 128
+TEMPLATE_ADD_BATCH_MAX = 4096
+
+def _template_batch_size(docs: List[Dict[str, Any]]) -> int:
+    """Rows per add_contents call, sized from the average snippet + description length seen so far."""
+    if not docs:
+        return TEMPLATE_ADD_BATCH_MIN
+    total = sum(len(d["text_content"] or "") + len(d["metadata"]["code_snippet"]) for d in docs)
+    avg = max(1, total // len(docs))
+    return max(TEMPLATE_ADD_BATCH_MIN, min(TEMPLATE_ADD_BATCH_MAX, TEMPLATE_ADD_BATCH_BYTES // avg))
+
+# Sotto questa soglia la scansione brute-force è più veloce di un indice IVF-PQ
+VECTOR_INDEX_MIN_ROWS = 5000
+
+def _maybe_create_vector_index(vector_db: LanceDb) -> None:
+    """Crea l'indice IVF-PQ sulla tabella del template se ha abbastanza righe."""
+    try:
+        tbl = vector_db.table
+        if tbl is None:
+            return
+        row_count = tbl.count_rows()
+        if row_count < VECTOR_INDEX_MIN_ROWS:
+            return
+
+        import math
+        partitions = max(2, min(256, int(math.sqrt(row_count))))
+        tbl.create_index(
+            metric="cosine",
+            vector_column_name=vector_db._vector_col,
+            num_partitions=partitions,
+            num_sub_vectors=96,
+            replace=True
+        )
+        logger.info(f"Vector index created on '{vector_db.table_name}' ({row_count} rows, {partitions} partitions)")
+    except Exception as e:
+        logger.warning(f"Vector index creation skipped: {e}")
+
+def _html_parser_name() -> str:
+    """lxml (C parser) when installed, else the pure-Python stdlib parser."""
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+HTML_PARSER = _html_parser_name()
+
 class UIComponent(BaseModel):
     name: str = Field(..., description="Name of the component (e.g. 'Navbar', 'Hero Section')")
     category: str = Field(..., description="Category (e.g. 'Navigation', 'Header', 'Form')")
@@ -33,6 +213,99 @@ class UIComponent(BaseModel):
 class AnalysisResult(BaseModel):
     components: List[UIComponent] = Field(default_factory=list)
 
+# Cache su disco delle analisi UI: oltre questo numero di voci si eliminano le meno usate (mtime)
+ANALYSIS_CACHE_MAX_ENTRIES = 2000
+
+def _load_cached_analysis(cache_path: str) -> Optional[AnalysisResult]:
+    """Cached UI analysis, or None if missing/unreadable (treated as a miss)."""
+    try:
+        with open(cache_path, "rb") as f:
+            result = AnalysisResult.model_validate_json(f.read())
+    except Exception:
+        return None
+    try:
+        # Hit: refresh mtime so pruning drops least-recently-used entries first
+        os.utime(cache_path)
+    except OSError:
+        pass
+    return result
+
+def _store_cached_analysis(cache_path: str, result: AnalysisResult) -> None:
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(result.model_dump_json())
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Analysis cache write skipped: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def _prune_analysis_cache(cache_dir: str, max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES) -> int:
+    """Deletes the oldest cached analyses (by mtime) beyond max_entries. Returns how many were removed."""
+    entries = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"): continue
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+    except OSError:
+        return 0
+    if len(entries) <= max_entries:
+        return 0
+
+    entries.sort()
+    removed = 0
+    for _, path in entries[:len(entries) - max_entries]:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+def _extract_components(soup, components_list: List[UIComponent], template_id: str, rel_path: str) -> List[Dict[str, Any]]:
+    """Resolves each analyzed component's selector on the already-parsed page."""
+    extracted_docs = []
+    filename = os.path.basename(rel_path)
+    for comp in components_list:
+        selector = comp.selector
+        if not selector: continue
+
+        try:
+            element = soup.select_one(selector)
+        except Exception as e:
+            # Selectors come from the LLM: one invalid selector must not drop the whole file
+            logger.warning(f"Invalid selector '{selector}' in {rel_path}: {e}")
+            continue
+
+        if element:
+            # ID Unique for Vector DB
+            chunk_id = f"{template_id}#{rel_path}#{selector}"
+
+            extracted_docs.append({
+                "name": chunk_id,
+                "text_content": comp.description, # Semantic Description
+                "metadata": {
+                    "template_id": template_id,
+                    "path": rel_path,
+                    "filename": filename,
+                    "component_name": comp.name,
+                    "category": comp.category,
+                    "requires_js": comp.requires_js,
+                    "dependencies": orjson.dumps(comp.dependencies).decode(), # Store deps!
+                    "selector": selector,
+                    "code_snippet": str(element),
+                    "is_template": True
+                }
+            })
+    return extracted_docs
+
 class TemplateIndexer:
     def __init__(self, project_root: str, llm_settings: Optional[LLMSettings] = None):
         self.project_root = project_root
@@ -49,15 +322,19 @@ class TemplateIndexer:
         os.makedirs(self.knowledge_base_dir, exist_ok=True)
         os.makedirs(self.public_templates_dir, exist_ok=True)
 
+        # On-disk cache of UI analyses (one JSON per prompt hash)
+        self.analysis_cache_dir = os.path.join(self.knowledge_base_dir, "llm_cache")
+        os.makedirs(self.analysis_cache_dir, exist_ok=True)
+
         # Use ThemeChunker for smart indexing of templates
         self.chunker = ThemeChunker()
 
         # Shared Embedder (Cached Singleton)
         self.embedder = get_shared_embedder()
 
-    async def process_template_zip(self, zip_path: str) -> AsyncGenerator[Dict[str, Any], None]:
+    async def process_template_zip(self, zip_source: Union[str, BinaryIO]) -> AsyncGenerator[Dict[str, Any], None]:
         """
-        Processing flow for Template ZIPs:
+        Processing flow for Template ZIPs (zip_source: path or seekable binary stream):
         1. Extract to temp
         2. Find Manifest (Get Template ID)
         3. Extract Preview Image -> public/templates
@@ -71,15 +348,12 @@ class TemplateIndexer:
             yield {"status": "extracting", "message": "Extracting ZIP file..."}
             
             # BLOCKING I/O: Run in thread
-            def extract_zip():
-                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                    zip_ref.extractall(temp_dir)
-            
-            await asyncio.to_thread(extract_zip)
+            await asyncio.to_thread(_extract_zip, zip_source, temp_dir)
             
             # --- 1. Identify Template from Manifest ---
-            # BLOCKING I/O: Run in thread
-            manifest_files = await asyncio.to_thread(glob.glob, os.path.join(temp_dir, "**/*.manifest"), recursive=True)
+            # BLOCKING I/O: one traversal of the extracted tree serves manifest, preview and HTML lookups
+            scanned = await asyncio.to_thread(_scan_template, temp_dir)
+            manifest_files = scanned.manifests
             
             if not manifest_files:
                 raise ValueError("No .manifest file found in ZIP! Cannot identify template.")
@@ -102,7 +376,7 @@ class TemplateIndexer:
                 logger.warning(f"Could not save manifest: {e}")
 
             # Look for theme_screen.png anywhere
-            preview_files = await asyncio.to_thread(glob.glob, os.path.join(temp_dir, "**", "theme_screen.png"), recursive=True)
+            preview_files = scanned.previews
             
             has_preview = False
 
@@ -123,7 +397,8 @@ class TemplateIndexer:
             # Copytree requires destination to NOT exist (usually), or ignore errors
             # Since we just cleaned it or it's new, we can copy.
             try:
-                await asyncio.to_thread(shutil.copytree, temp_dir, assets_dir)
+                # The extract dir is private and deleted afterwards, so linking its files is safe
+                await asyncio.to_thread(shutil.copytree, temp_dir, assets_dir, copy_function=_link_or_copy)
                 yield {"status": "copying", "message": f"Assets archived to {assets_dir}"}
             except Exception as e:
                 logger.error(f"Failed to copy assets: {e}")
@@ -160,12 +435,6 @@ class TemplateIndexer:
             # --- 4. Indexing Content (AI-DRIVEN) ---
             # Instead of naive chunking, we use UIArchitectAgent + BeautifulSoup
             
-            # Import dependencies
-            # Wrapper to handle Pydantic Response
-            from bs4 import BeautifulSoup
-            from agno.agent import Agent
-            from src.core.config.factory_models import build_model_for_runtime
-
             # Initialize Architect
             if not self.llm_settings:
                 # Fallback or error? For now, we assume settings are passed.
@@ -173,137 +442,182 @@ class TemplateIndexer:
                 yield {"status": "error", "message": "LLM Settings missing for AI Analysis."}
                 return
 
-            model = build_model_for_runtime(
-                 provider=self.llm_settings.provider,
-                 model_id=self.llm_settings.model_id,
-                 temperature=0.1,
-                 api_key=self.llm_settings.api_key,
-                 base_url=self.llm_settings.base_url
-            )
-
-            ui_architect_agent = Agent(
-                model=model,
-                description="UI Architect",
-                instructions=load_prompt("brain/ui_architect_indexer.md"),
-                markdown=True,
-                output_schema=AnalysisResult
-            )
+            model_config = prepare_model_config(self.llm_settings, temperature=0.1)
+
+            instructions = load_prompt("brain/ui_architect_indexer.md")
+
+            # Analysis cache namespace: a different model or prompt never reuses old results
+            cache_salt = hashlib.sha256(
+                f"{self.llm_settings.provider}|{self.llm_settings.model_id}|{instructions}".encode("utf-8")
+            ).hexdigest()
+            # Identical files analyzed concurrently: one LLM call, the others wait and hit the cache
+            key_locks: Dict[str, threading.Lock] = {}
+            key_locks_guard = threading.Lock()
+
+            def analysis_key_lock(cache_key):
+                with key_locks_guard:
+                    return key_locks.setdefault(cache_key, threading.Lock())
+
+            def drop_analysis_key_lock(cache_key):
+                # Called by the holder once the entry is on disk: later callers hit the cache file
+                with key_locks_guard:
+                    key_locks.pop(cache_key, None)
+
+            def make_ui_architect_agent():
+                # Agent e modello per analisi: le run concorrenti non condividono stato (solo il pool HTTP).
+                # Bounded calls: a hung or runaway request must not wedge the whole install
+                return Agent(
+                    model=build_model_for_runtime(
+                        *model_config,
+                        timeout=UI_ANALYSIS_TIMEOUT_S,
+                        max_tokens=UI_ANALYSIS_MAX_TOKENS,
+                        max_retries=UI_ANALYSIS_MAX_RETRIES
+                    ),
+                    description="UI Architect",
+                    instructions=instructions,
+                    markdown=True,
+                    output_schema=AnalysisResult
+                )
             
             # Wrapper to handle Pydantic Response
             # We keep this as a local helper
             
-            files_to_index = []
-            
-            # Scan all files - FOCUS ON HTML
-            # os.walk is blocking.
-            for root, _, files in await asyncio.to_thread(lambda: list(os.walk(temp_dir))):
-                 for file in files:
-                    full_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(full_path, temp_dir).replace("\\", "/")
-                    
-                    # AI Analysis only for HTML files
-                    if file.lower().endswith((".html", ".htm")):
-                         files_to_index.append((full_path, rel_path))
+            # AI Analysis only for HTML files (collected by the initial scan)
+            files_to_index = scanned.html
+            if scanned.skipped_html:
+                logger.info(f"Skipped {len(scanned.skipped_html)} oversized/binary HTML files: {scanned.skipped_html[:10]}")
+                yield {"status": "warning", "message": f"Skipped {len(scanned.skipped_html)} oversized or binary HTML files."}
             
             total_files = len(files_to_index)
             yield {"status": "indexing", "total": total_files, "current": 0, "message": "Starting AI Analysis..."}
 
-            batch_docs = []
-            
-            for i, (full_path, rel_path) in enumerate(files_to_index):
-                try:
-                    yield {"status": "indexing", "total": total_files, "current": i+1, "message": f"Analyzing UI: {rel_path}..."}
-                    
-                    # BLOCKING I/O
-                    def read_file():
-                        with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-                            return f.read()
-                    
-                    content = await asyncio.to_thread(read_file)
-
-                    # WRAP BLOCKING ANALYSIS IN A FUNCTION
-                    def analyze_html_content(html_content):
-                        # 1. PRE-SCAN: Extract Assets (The "Menu")
-                        soup = BeautifulSoup(html_content, "html.parser")
-                        assets_found = []
-                        # Find CSS
-                        for link in soup.find_all('link', rel='stylesheet'):
-                            href = link.get('href')
-                            if href: assets_found.append(href)
-                        # Find JS
-                        for script in soup.find_all('script'):
-                            src = script.get('src')
-                            if src: assets_found.append(src)
-                        
-                        assets_json_string = json.dumps(list(set(assets_found)), indent=2)
-
-                        # 2. SEQUENCE: AI Analysis with Context
-                        prompt_msg = (
-                            f"### AVAILABLE ASSETS (The 'Pantry'):\n{assets_json_string}\n\n"
-                            f"### HTML CONTENT TO ANALYZE:\n```html\n{html_content[:50000]}\n```"
-                        )
-
+            # WRAP BLOCKING ANALYSIS IN A FUNCTION
+            # Set on client disconnect / error: worker threads already inside to_thread can't be
+            # cancelled, so they check it and skip the LLM call and the cache write
+            cancelled = threading.Event()
+
+            def analyze_html_content(html_content, rel_path):
+                if cancelled.is_set(): return []
+                # 1. PRE-SCAN: Extract Assets (The "Menu")
+                soup = BeautifulSoup(html_content, HTML_PARSER)
+                assets_found = []
+                # Find CSS
+                for link in soup.find_all('link', rel='stylesheet'):
+                    href = link.get('href')
+                    if href: assets_found.append(href)
+                # Find JS
+                for script in soup.find_all('script'):
+                    src = script.get('src')
+                    if src: assets_found.append(src)
+                
+                # Dedup in document order: a stable prompt (and analysis cache key) across processes
+                assets_json_string = orjson.dumps(list(dict.fromkeys(assets_found)), option=orjson.OPT_INDENT_2).decode()
+
+                # 2. SEQUENCE: AI Analysis with Context
+                prompt_msg = (
+                    f"### AVAILABLE ASSETS (The 'Pantry'):\n{assets_json_string}\n\n"
+                    f"### HTML CONTENT TO ANALYZE:\n```html\n{html_content[:50000]}\n```"
+                )
+
+                # Exact cache: same prompt (HTML + assets) under the same model/instructions -> same analysis.
+                # Shared partials and re-installs of a theme skip the LLM entirely.
+                cache_key = hashlib.sha256((cache_salt + prompt_msg).encode("utf-8", errors="ignore")).hexdigest()
+                cache_path = os.path.join(self.analysis_cache_dir, f"{cache_key}.json")
+
+                with analysis_key_lock(cache_key):
+                    result = _load_cached_analysis(cache_path)
+                    if result is None and not cancelled.is_set():
                         # LLM Call - Running sync inside this thread function is fine as whole function is threaded
                         try:
                             # ui_architect_agent.run IS BLOCKING, so running it here is perfect.
-                            response = ui_architect_agent.run(prompt_msg)
+                            response = make_ui_architect_agent().run(prompt_msg)
                             
                             # Agno with response_model returns the object directly in content usually, 
                             # or we access it depending on version. 
                             result = response.content
-                            components_list = result.components if hasattr(result, "components") else []
+                            if isinstance(result, AnalysisResult) and not cancelled.is_set():
+                                _store_cached_analysis(cache_path, result)
                         except Exception as e:
                             logger.error(f"Agent Run Failed: {e}")
-                            components_list = []
-                        
-                        # 3. EXTRACTION
-                        extracted_docs = []
-                        for comp in components_list:
-                            selector = comp.selector
-                            if not selector: continue
-
-                            element = soup.select_one(selector)
-                            
-                            if element:
-                                raw_code = str(element)
-                                
-                                # ID Unique for Vector DB
-                                chunk_id = f"{template_id}#{rel_path}#{selector}"
-                                
-                                extracted_docs.append({
-                                    "name": chunk_id,
-                                    "text_content": comp.description, # Semantic Description
-                                    "metadata": {
-                                        "template_id": template_id,
-                                        "path": rel_path,
-                                        "filename": os.path.basename(rel_path),
-                                        "component_name": comp.name,
-                                        "category": comp.category,
-                                        "requires_js": comp.requires_js,
-                                        "dependencies": json.dumps(comp.dependencies), # Store deps!
-                                        "selector": selector,
-                                        "code_snippet": raw_code,
-                                        "is_template": True
-                                    }
-                                })
-                        return extracted_docs
-
-                    # Execute Analysis in Thread
-                    extracted_chunk_docs = await asyncio.to_thread(analyze_html_content, content)
-                    
+                            result = None
+                    components_list = result.components if hasattr(result, "components") else []
+                    # Entry written (or the call failed): the lock has done its job, don't keep it around
+                    drop_analysis_key_lock(cache_key)
+                
+                # 3. EXTRACTION (same parsed tree as the pre-scan)
+                return _extract_components(soup, components_list, template_id, rel_path)
+
+            def analyze_file(full_path, rel_path):
+                # BLOCKING I/O + LLM call: runs in a worker thread
+                with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
+                    content = f.read()
+                return analyze_html_content(content, rel_path)
+
+            # LLM calls are network-bound: analyze several files at once, bounded for provider rate limits
+            semaphore = asyncio.Semaphore(UI_ANALYSIS_CONCURRENCY)
+
+            async def analyze_bounded(full_path, rel_path):
+                async with semaphore:
+                    try:
+                        return rel_path, await asyncio.to_thread(analyze_file, full_path, rel_path)
+                    except Exception as e:
+                        logger.error(f"Error analyzing {rel_path}: {e}")
+                        return rel_path, []
+
+            batch_docs = []
+            batch_size = TEMPLATE_ADD_BATCH_MIN
+            written_docs = 0
+            # At most one write in flight: embedding/writing batch k overlaps the analysis of batch k+1
+            pending_write: Optional[asyncio.Future] = None
+
+            async def flush(docs):
+                nonlocal pending_write, written_docs
+                if pending_write is not None:
+                    await pending_write
+                # knowledge.add_contents is blocking (embedding + LanceDB write)
+                pending_write = asyncio.ensure_future(asyncio.to_thread(knowledge.add_contents, docs))
+                written_docs += len(docs)
+
+            tasks = [asyncio.create_task(analyze_bounded(full_path, rel_path)) for full_path, rel_path in files_to_index]
+            try:
+                # Progress streams as each file finishes, not in submission order
+                for i, next_done in enumerate(asyncio.as_completed(tasks), 1):
+                    rel_path, extracted_chunk_docs = await next_done
+                    yield {"status": "indexing", "total": total_files, "current": i, "message": f"Analyzed UI: {rel_path}"}
+
                     if extracted_chunk_docs:
+                         if not written_docs and not batch_docs:
+                             batch_size = _template_batch_size(extracted_chunk_docs)
                          batch_docs.extend(extracted_chunk_docs)
                          logger.info(f"      [OK] Extracted {len(extracted_chunk_docs)} components from {rel_path}")
 
-                except Exception as e:
-                    logger.error(f"Error analyzing {rel_path}: {e}")
-
-
-
-            # Final Batch insert
+                    # Streaming insert: bounded memory instead of one oversized write at the end
+                    while len(batch_docs) >= batch_size:
+                        chunk = batch_docs[:batch_size]
+                        del batch_docs[:batch_size]
+                        await flush(chunk)
+                        batch_size = _template_batch_size(chunk)
+            finally:
+                # Client disconnected / error: cancel() drops the analyses still waiting on the semaphore;
+                # those already in a worker thread see the event and stop before the LLM call / cache write
+                cancelled.set()
+                for task in tasks:
+                    task.cancel()
+
+            # All analyses stored: keep the on-disk cache bounded
+            pruned = await asyncio.to_thread(_prune_analysis_cache, self.analysis_cache_dir)
+            if pruned:
+                logger.info(f"Analysis cache: pruned {pruned} least-recently-used entries")
+
+            # Remainder + wait for the last write
             if batch_docs:
-                # knowledge.add_contents might be blocking
-                await asyncio.to_thread(knowledge.add_contents, batch_docs)
+                await flush(batch_docs)
+                batch_docs = []
+            if pending_write is not None:
+                await pending_write
+            if written_docs:
+                # Large templates: sub-linear semantic search instead of a full scan
+                await asyncio.to_thread(_maybe_create_vector_index, vector_db)
 
             yield {
                 "status": "complete", 
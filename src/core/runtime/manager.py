@@ -1,8 +1,10 @@
 import logging
 import os
+import uuid
 from typing import AsyncGenerator, Optional, Any, List, Dict
 from agno.agent import Agent
-from src.agents.factory import build_agents
+from src.agents.factory import get_agents, release_agents, LazyAgent
+from src.core.runtime.shadow_workspace import ShadowWorkspace
 from src.models import LLMSettings
 
 # --- Setup Logging ---
@@ -22,7 +24,10 @@ class VibingManager:
         # 1. Build specialized Agents via Factory
         # The factory returns a map: {"CODER": coder_obj, "ARCHITECT": arch_obj}
         # auto_approval is now True by default as per your new architecture
-        self.agents_map: Dict[str, Agent] = build_agents(project_root, session_id, auto_approval, llm_settings, selected_theme_id)
+        # Agents are cached per (project, session, settings): follow-up turns skip the rebuild.
+        # The map is checked out for this manager and handed back once a run finishes.
+        self._agents_args = (project_root, session_id, auto_approval, llm_settings, selected_theme_id)
+        self.agents_map: Dict[str, Agent] = get_agents(*self._agents_args)
 
     async def arun(
         self, 
@@ -48,15 +53,17 @@ class VibingManager:
 
         logger.info(f"Routing request to: {agent_id} | Session: {self.session_id}")
 
+        # First use of a lazy agent: build it (model client, knowledge, storage) off the event loop
+        if isinstance(active_agent, LazyAgent):
+            active_agent = await active_agent.aresolve()
+
         # --- 0. Context Injection (Shadow Workspace) ---
-        from src.core.runtime.shadow_workspace import ShadowWorkspace
         # We need a stable run_id for this turn to track changes.
         # If kwargs has run_id use it, else generate (though typically run_id is internal to Agent)
         # Ideally we want the SAME run_id that the agent receives.
         # Since Agno generates run_id internally if not passed, we might be out of sync if we generate one here.
         # HOWEVER, we can simple trigger the context with a "Turn ID".
         # Let's generate a unique ID for this 'Action Turn' which suffices for the Undo feature.
-        import uuid
         current_run_context_id = str(uuid.uuid4())
         
         ShadowWorkspace.get_instance().set_context(
@@ -113,3 +120,7 @@ class VibingManager:
                  pass
 
             yield event
+
+        # Run completed: hand the agents back to the cache for the next turn.
+        # Failed or interrupted runs drop them instead (the next turn builds fresh ones).
+        release_agents(self.agents_map, *self._agents_args)
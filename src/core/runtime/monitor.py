@@ -5,10 +5,12 @@ import time
 from typing import Dict, Optional, Any, Tuple
 from dataclasses import dataclass
 
-from src.core.storage.storage import TABLE_NAME
+from src.core.storage.storage import TABLE_NAME, invalidate_agent_storage
+from src.core.storage.knowledge import invalidate_shared_knowledge
 from src.core.runtime.project_init import get_db_path
 from src.core.indexing.indexer_engine import UniversalCodeIndexer
 from src.core.runtime.watcher import start_watcher
+from src.core.runtime.server_utils import normalize_path
 
 logger = logging.getLogger(__name__)
 
@@ -55,12 +57,23 @@ class CodebaseRegistry:
 
             self._last_cleanup = current_time
 
+    def _drop_project_caches(self, path: str):
+        """Libera le cache per-progetto (knowledge, storage, agenti) di un progetto fermato."""
+        # Import locale: factory -> tools -> monitor (import circolare a livello di modulo)
+        from src.agents.factory import invalidate_agents
+
+        invalidate_agents(project_root=path)
+        invalidate_shared_knowledge(path)
+        invalidate_agent_storage(path)
+
     async def _stop_context(self, path: str):
         """Ferma watcher e indexer per un progetto specifico."""
         ctx = self._active_contexts.get(path)
         if not ctx:
             return
 
+        self._drop_project_caches(path)
+
         if ctx.observer:
             try:
                 # Esegui operazioni bloccanti in thread separato per non bloccare il loop eventi
@@ -100,7 +113,24 @@ class CodebaseRegistry:
         return ActiveContext(indexer=indexer, observer=observer, ref_count=1, last_used=time.time())
 
     def _normalize_path(self, raw_path: str) -> str:
-        return os.path.abspath(raw_path.strip('"').strip("'"))
+        return normalize_path(raw_path)
+
+    def try_acquire(self, raw_path: str) -> bool:
+        """
+        Fast path sincrono: se il progetto è già attivo incrementa il ref_count e ritorna True,
+        senza await né syscall. Ritorna False se serve ensure_initialized().
+        """
+        # Se il lock è occupato (creazione/cleanup in corso) usa il percorso lento
+        if self._lock.locked():
+            return False
+
+        ctx = self._active_contexts.get(self._normalize_path(raw_path))
+        if ctx is None:
+            return False
+
+        ctx.ref_count += 1
+        ctx.last_used = time.time()
+        return True
 
     async def get_existing_indexer(self, raw_path: str) -> Optional[UniversalCodeIndexer]:
         """Returns the indexer if already loaded in RAM (thread-safe)."""
@@ -13,6 +13,14 @@ except ImportError:
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+def canonical_project_root(project_root: str) -> str:
+    """
+    Canonical key for per-project caches: "./proj", "/abs/proj" and symlinked spellings
+    of the same directory map to one entry.
+    """
+    return os.path.realpath(os.path.abspath(project_root))
+
+
 def get_db_path(project_root: Optional[str] = None) -> str:
     """
     Returns the LanceDB database path in the .crick/knowledge/ directory of the project.
@@ -1,12 +1,180 @@
 import os
-from typing import List, Dict, Any
+import re
+import difflib
+import tempfile
+import orjson
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 
+_CONTENT_EVENTS = frozenset(('RunContent', 'IntermediateRunContent'))
+
+def _as_dict(obj: Any) -> Dict[str, Any]:
+    """Restituisce una vista dict di un evento/tool Agno (dict o oggetto)."""
+    if isinstance(obj, dict):
+        return obj
+    return getattr(obj, '__dict__', None) or {}
+
+@lru_cache(maxsize=512)
 def normalize_path(project_path: str) -> str:
+    # Memoized: il risultato dipende dalla CWD, che il server non cambia mai
     return os.path.abspath(project_path.strip('"').strip("'"))
 
+@lru_cache(maxsize=256)
+def resolve_root(project_root: str) -> Tuple[str, str]:
+    """
+    Path reale (symlink risolti, case normalizzato) della root di progetto e il suo prefisso
+    con separatore finale, per il containment check. Memoized.
+    """
+    abs_root = os.path.normcase(os.path.realpath(project_root))
+    prefix = abs_root if abs_root.endswith(os.sep) else abs_root + os.sep
+    return abs_root, prefix
+
+def resolve_in_root(project_root: str, *parts: str) -> Optional[str]:
+    """Risolve parts sotto project_root. Ritorna None se il risultato esce dalla root."""
+    abs_root, prefix = resolve_root(project_root)
+    abs_path = os.path.normcase(os.path.realpath(os.path.join(abs_root, *parts)))
+    # Entrambi i path sono reali e normalizzati: il confronto col prefisso "root + sep"
+    # equivale a commonpath ('/proj-evil' non passa come figlio di '/proj') ma senza
+    # split/zip dei componenti. Drive diversi (Windows) non matchano il prefisso.
+    if abs_path != abs_root and not abs_path.startswith(prefix):
+        return None
+    return abs_path
+
+_O_RDONLY_BINARY = os.O_RDONLY | getattr(os, 'O_BINARY', 0)
+
+def read_bytes(path: str) -> Optional[bytes]:
+    """
+    Legge un file in binario. Ritorna None se il file non esiste (anche se un componente del path non è una directory).
+    Usa fd grezzi: open + fstat + un solo read + close, senza gli isatty/lseek/fstat
+    extra del layer io bufferizzato (circa metà delle syscall per i file piccoli).
+    """
+    try:
+        fd = os.open(path, _O_RDONLY_BINARY)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    try:
+        size = os.fstat(fd).st_size
+        # +1: se il file non è cresciuto, il primo read conferma già l'EOF
+        data = os.read(fd, size + 1)
+        if len(data) <= size:
+            return data
+        chunks = [data]
+        while True:
+            chunk = os.read(fd, 1 << 20)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+
+def decode_text(data: bytes) -> str:
+    """Decode UTF-8 ('replace') con la stessa traduzione dei newline della modalità testo."""
+    text = data.decode('utf-8', errors='replace')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+def read_text(path: str) -> Optional[str]:
+    """
+    Legge un file di testo (lettura binaria + decode UTF-8 con 'replace').
+    Ritorna None se il file non esiste (nessuna os.path.exists separata).
+    """
+    data = read_bytes(path)
+    return None if data is None else decode_text(data)
+
+def _current_umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+_UMASK = _current_umask()
+
+def write_text_atomic(path: str, content: str) -> None:
+    """
+    Scrive un file piccolo in modo atomico: temp file + fsync + os.replace.
+    Un crash a metà scrittura lascia il vecchio contenuto, mai un file troncato.
+    """
+    # Temp univoco accanto al file: scritture concorrenti non si contendono lo stesso nome
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        try:
+            os.write(fd, content.encode('utf-8'))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        # mkstemp crea il file 0o600: stessi permessi della versione precedente (0o644 meno umask)
+        os.chmod(tmp_path, 0o644 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+_HUNK_HEADER_RE = re.compile(r'^@@ -(\d+)(,\d+)? \+(\d+)(,\d+)? @@')
+
+def unified_diff_text(old_text: str, new_text: str, fromfile: str, tofile: str, n: int = 3) -> str:
+    """
+    Unified diff (formato difflib.unified_diff) delle righe dei due testi, ma il SequenceMatcher
+    lavora solo sulla parte centrale che differisce (+ n righe di contesto): prefisso e
+    suffisso comuni vengono tagliati e i numeri di riga negli header @@ ri-traslati.
+    Per le modifiche localizzate su file grandi evita il costo quadratico del matcher.
+
+    Non è byte-identico a difflib sull'intero file: con righe ripetute il matcher può
+    allineare la modifica in un punto diverso, quindi gli hunk possono cadere altrove
+    (es. 'a\na\na\na\na\n' -> 'b\na\na\na\na\n'). Il diff resta comunque valido:
+    applicato al vecchio testo produce il nuovo.
+    """
+    old_lines = old_text.splitlines(keepends=True)
+    new_lines = new_text.splitlines(keepends=True)
+
+    # Righe comuni in testa e in coda (senza sovrapposizioni)
+    limit = min(len(old_lines), len(new_lines))
+    prefix = 0
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+
+    # Mantieni n righe di contesto su ogni lato (gli hunk possono essere posizionati
+    # diversamente da difflib sul file intero, ma si applicano allo stesso modo)
+    lo = max(0, prefix - n)
+    keep_suffix = suffix - min(suffix, n)
+    old_mid = old_lines[lo:len(old_lines) - keep_suffix]
+    new_mid = new_lines[lo:len(new_lines) - keep_suffix]
+
+    diff_gen = difflib.unified_diff(old_mid, new_mid, fromfile=fromfile, tofile=tofile, n=n)
+    if not lo:
+        return "".join(diff_gen)
+
+    def shift(match: "re.Match") -> str:
+        old_start, old_len, new_start, new_len = match.groups()
+        return f"@@ -{int(old_start) + lo}{old_len or ''} +{int(new_start) + lo}{new_len or ''} @@"
+
+    return "".join(
+        _HUNK_HEADER_RE.sub(shift, line, count=1) if line.startswith("@@") else line
+        for line in diff_gen
+    )
+
 def transform_runs_to_messages(runs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Trasforma una lista di runs Agno in una lista di ChatMessage per la UI.
+    Vedi iter_messages per il formato.
+    """
+    return list(iter_messages(runs))
+
+def messages_json(runs: Iterable[Dict[str, Any]]) -> bytes:
+    """
+    Body JSON {"messages": [...]} della cronologia, serializzato in un'unica chiamata orjson.
+    Sincrono (trasformazione + dumps sono CPU-bound): i chiamanti async lo eseguono in to_thread.
+    """
+    return orjson.dumps({"messages": list(iter_messages(runs))}, default=str)
+
+def iter_messages(runs: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Genera i ChatMessage per la UI a partire da una lista di runs Agno.
 
     Ogni run rappresenta una esecuzione di un agente in risposta a un input utente.
     Struttura attesa di una run:
@@ -16,13 +184,12 @@ def transform_runs_to_messages(runs: List[Dict[str, Any]]) -> List[Dict[str, Any
     - agent_name: nome dell'agente
     - created_at: timestamp
 
-    Ritorna lista di ChatMessage nel formato:
+    Genera ChatMessage nel formato:
     - id: numero (timestamp)
     - role: 'user' o 'assistant'
     - content: string (per messaggi utente)
     - timeline: lista di TimelineItem (per messaggi assistant)
     """
-    messages = []
     message_id_counter = 1  # Simple counter for IDs
 
     for run in runs:
@@ -36,115 +203,124 @@ def transform_runs_to_messages(runs: List[Dict[str, Any]]) -> List[Dict[str, Any
             user_content = input_data
 
         if user_content:
-            user_message = {
+            yield {
                 'id': message_id_counter,
                 'role': 'user',
                 'content': user_content
             }
-            messages.append(user_message)
             message_id_counter += 1
 
         # 2. Crea messaggio assistant dagli eventi
-        events = run.get('events', [])
+        # Normalizza gli eventi una sola volta (dict o oggetti Agno -> dict)
+        events = [_as_dict(e) for e in run.get('events') or ()]
         agent_name = run.get('agent_name', 'System')
+        run_content = run.get('content')
 
-        if events or run.get('content'):
-            assistant_message = {
-                'id': message_id_counter,
-                'role': 'assistant',
-                'timeline': []
-            }
+        if events or run_content:
+            timeline = []
+            append = timeline.append
+            message_id = message_id_counter
             message_id_counter += 1
+            pending_tools = {}  # Mappa tool_name -> (index nella timeline, tool item)
 
-            timeline = assistant_message['timeline']
-            pending_tools = {}  # Mappa tool_name -> index nella timeline
-
-            # Processa eventi in ordine
-            for event in events:
-                event_type = event.get('event', '') if isinstance(event, dict) else getattr(event, 'event', '')
-
-                # RunContent -> text timeline item
-                if event_type in ['RunContent', 'IntermediateRunContent']:
-                    content = event.get('content', '')
-                    if content:
-                        # Cerca se c'è già un item text dello stesso agente
-                        if timeline and timeline[-1]['type'] == 'text' and timeline[-1]['agent'] == agent_name:
-                            # Appendi al contenuto esistente
-                            timeline[-1]['content'] += content
-                        else:
-                            # Nuovo item text
-                            timeline.append({
-                                'type': 'text',
-                                'content': content,
-                                'agent': agent_name
-                            })
+            # Vista colonnare: tipi evento estratti una sola volta
+            event_types = [event.get('event', '') for event in events]
 
-                # ToolCallStarted -> tool timeline item con status running
-                elif event_type == 'ToolCallStarted':
-                    tool_data = event.get('tool', {})
-                    if isinstance(tool_data, dict):
-                        tool_name = tool_data.get('tool_name', 'unknown')
-                        tool_args = tool_data.get('tool_args', {})
-                    else:
-                        tool_name = getattr(tool_data, 'tool_name', 'unknown')
-                        tool_args = getattr(tool_data, 'tool_args', {})
-
-                    tool_item = {
-                        'type': 'tool',
-                        'tool': tool_name,
-                        'args': tool_args,
-                        'status': 'running',
+            if all(event_type in _CONTENT_EVENTS for event_type in event_types):
+                # Fast path (caso più comune): solo contenuto testuale -> un unico join in C
+                text = ''.join([event.get('content') or '' for event in events])
+                if text:
+                    append({
+                        'type': 'text',
+                        'content': text,
                         'agent': agent_name
-                    }
-                    timeline.append(tool_item)
-                    pending_tools[tool_name] = len(timeline) - 1
-
-                # ToolCallCompleted -> aggiorna tool a completed o converte in terminal
-                elif event_type == 'ToolCallCompleted':
-                    tool_data = event.get('tool', {})
-                    if isinstance(tool_data, dict):
-                        tool_name = tool_data.get('tool_name', 'unknown')
-                        result = str(tool_data.get('result', ''))
-                    else:
-                        tool_name = getattr(tool_data, 'tool_name', 'unknown')
-                        result = str(getattr(tool_data, 'result', ''))
-
-                    # Cerca l'ultimo tool con questo nome nello stato running
-                    tool_index = pending_tools.get(tool_name)
-                    if tool_index is not None and tool_index < len(timeline):
-                        tool_item = timeline[tool_index]
-                        if tool_item['type'] == 'tool' and tool_item['status'] == 'running':
-                            # Verifica se è un tool terminale (shell/build)
-                            is_terminal = ('Exit Code' in result or
-                                          'shell' in tool_name.lower() or
-                                          'build' in tool_name.lower())
-
-                            if is_terminal:
-                                # Converti in terminal item
-                                timeline[tool_index] = {
-                                    'type': 'terminal',
-                                    'command': tool_name,
-                                    'output': result,
+                    })
+            else:
+                # Frammenti dell'item text corrente (se è l'ultimo della timeline), uniti con join
+                text_item = None
+                text_parts = None
+
+                # Processa eventi in ordine
+                for event, event_type in zip(events, event_types):
+
+                    # RunContent -> text timeline item
+                    if event_type in _CONTENT_EVENTS:
+                        content = event.get('content', '')
+                        if content:
+                            if text_parts is not None:
+                                # Appendi al contenuto esistente
+                                text_parts.append(content)
+                            else:
+                                # Nuovo item text
+                                text_item = {
+                                    'type': 'text',
+                                    'content': content,
                                     'agent': agent_name
                                 }
-                            else:
-                                # Aggiorna a completed
-                                tool_item['status'] = 'completed'
-                                timeline[tool_index] = tool_item
+                                text_parts = [content]
+                                append(text_item)
+
+                    # ToolCallStarted -> tool timeline item con status running
+                    elif event_type == 'ToolCallStarted':
+                        if text_parts is not None:
+                            text_item['content'] = ''.join(text_parts)
+                            text_item = text_parts = None
+
+                        tool_data = _as_dict(event.get('tool') or {})
+                        tool_name = tool_data.get('tool_name', 'unknown')
+
+                        tool_item = {
+                            'type': 'tool',
+                            'tool': tool_name,
+                            'args': tool_data.get('tool_args', {}),
+                            'status': 'running',
+                            'agent': agent_name
+                        }
+                        pending_tools[tool_name] = (len(timeline), tool_item)
+                        append(tool_item)
+
+                    # ToolCallCompleted -> aggiorna tool a completed o converte in terminal
+                    elif event_type == 'ToolCallCompleted':
+                        tool_data = _as_dict(event.get('tool') or {})
+                        tool_name = tool_data.get('tool_name', 'unknown')
 
-                            # Rimuovi dai pending
-                            del pending_tools[tool_name]
+                        # Recupera (e rimuove dai pending) l'ultimo tool running con questo nome
+                        pending = pending_tools.pop(tool_name, None)
+                        if pending is None:
+                            continue
+                        tool_index, tool_item = pending
+
+                        result = str(tool_data.get('result', ''))
+                        lowered_name = tool_name.lower()
+
+                        # Verifica se è un tool terminale (shell/build)
+                        if 'Exit Code' in result or 'shell' in lowered_name or 'build' in lowered_name:
+                            # Converti in terminal item
+                            timeline[tool_index] = {
+                                'type': 'terminal',
+                                'command': tool_name,
+                                'output': result,
+                                'agent': agent_name
+                            }
+                        else:
+                            # Aggiorna a completed
+                            tool_item['status'] = 'completed'
+
+                if text_parts is not None:
+                    text_item['content'] = ''.join(text_parts)
 
             # Se non ci sono eventi ma c'è content, crea un item text dal content
-            if not timeline and run.get('content'):
-                timeline.append({
+            if not timeline and run_content:
+                append({
                     'type': 'text',
-                    'content': run['content'],
+                    'content': run_content,
                     'agent': agent_name
                 })
 
             # Aggiungi il messaggio assistant solo se ha timeline
             if timeline:
-                messages.append(assistant_message)
-
-    return messages
+                yield {
+                    'id': message_id,
+                    'role': 'assistant',
+                    'timeline': timeline
+                }
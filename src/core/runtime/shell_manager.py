@@ -10,6 +10,9 @@ from typing import Dict, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Host OS is fixed for the process lifetime
+IS_WINDOWS = platform.system() == "Windows"
+
 class ShellSession:
     """
     Represents a persistent shell session running in a background process.
@@ -31,12 +34,12 @@ class ShellSession:
         try:
             # Windows-specific flags to allow killing the whole process tree later
             creationflags = 0
-            if platform.system() == "Windows":
+            if IS_WINDOWS:
                  creationflags = subprocess.CREATE_NEW_PROCESS_GROUP
             
             self.process = subprocess.Popen(
                 # Use cmd.exe on Windows for better compatibility, or just shell=True default
-                "cmd.exe" if platform.system() == "Windows" else "/bin/bash", 
+                "cmd.exe" if IS_WINDOWS else "/bin/bash", 
                 cwd=self.cwd,
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
@@ -173,7 +176,7 @@ class ShellSession:
         """Terminates the process tree."""
         if self.process:
             try:
-                if platform.system() == "Windows":
+                if IS_WINDOWS:
                     subprocess.run(f"taskkill /F /T /PID {self.process.pid}", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
                 else:
                     os.killpg(os.getpgid(self.process.pid), signal.SIGKILL)
@@ -1,4 +1,4 @@
-import json
+import orjson
 import logging
 import asyncio
 from typing import Any, AsyncGenerator, cast
@@ -15,7 +15,7 @@ async def event_stream_generator(
     message: str = None,
     project_path: str = None,
     **kwargs
-) -> AsyncGenerator[str, None]:
+) -> AsyncGenerator[bytes, None]:
     """
     Universal stream generator for Agno.
     Handles both 'run' and 'continue' statelessly.
@@ -57,7 +57,7 @@ async def event_stream_generator(
                 # --- NEW: Handle Dictionary Events (e.g. Meta) ---
                 if isinstance(event, dict):
                     # Directly yield dictionary events (like our 'meta' event)
-                    yield f"data: {json.dumps(event)}\n\n"
+                    yield b"data: " + orjson.dumps(event) + b"\n\n"
                     continue
 
                 # --- A. CHECK FOR PAUSED STATUS (From Final Object) ---
@@ -83,7 +83,7 @@ async def event_stream_generator(
                         "agent_name": last_agent_name,
                         "tool": paused_tool
                     }
-                    yield f"data: {json.dumps(payload)}\n\n"
+                    yield b"data: " + orjson.dumps(payload) + b"\n\n"
                     continue # Don't process this object as a standard event
 
                 # --- B. STANDARD EVENT PROCESSING ---
@@ -140,7 +140,7 @@ async def event_stream_generator(
                         "agent_name": last_agent_name,
                         "tool": tool_name
                      }
-                     yield f"data: {json.dumps(payload)}\n\n"
+                     yield b"data: " + orjson.dumps(payload) + b"\n\n"
                      return
 
                 # --- C. CHECK FOR FAILED STATUS ---
@@ -148,14 +148,14 @@ async def event_stream_generator(
                 if hasattr(event, "status") and str(event.status).lower().endswith("failed"):
                      error_msg = getattr(event, "response", "Unknown agent error")
                      logger.error(f"[FAILED] AGENT FAILED: {error_msg}")
-                     yield f"data: {json.dumps({'type': 'error', 'message': f'Agent Run Failed: {error_msg}'})}\n\n"
+                     yield b"data: " + orjson.dumps({'type': 'error', 'message': f'Agent Run Failed: {error_msg}'}) + b"\n\n"
                      return
 
                 # Send payload
                 if payload:
-                    yield f"data: {json.dumps(payload)}\n\n"
+                    yield b"data: " + orjson.dumps(payload) + b"\n\n"
 
-            yield "data: [DONE]\n\n"
+            yield b"data: [DONE]\n\n"
 
         except asyncio.CancelledError:
             logger.warning("[WARN] Stream cancelled by client.")
@@ -180,7 +180,7 @@ async def event_stream_generator(
             else:
                  user_msg = f"System Error: {error_str}"
 
-            yield f"data: {json.dumps({'type': 'error', 'message': user_msg})}\n\n"
+            yield b"data: " + orjson.dumps({'type': 'error', 'message': user_msg}) + b"\n\n"
     finally:
         if project_path:
             try:
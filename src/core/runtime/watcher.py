@@ -205,7 +205,8 @@ class ProjectWatcher(FileSystemEventHandler):
             with self.db_lock:
                 logger.info(f"Rilevata modifica: {os.path.basename(path)}")
                 # Chiama l'upsert intelligente (che deciderà se fare chunking o no)
-                self.indexer.upsert_file(path, self.root_dir, verbose=True)
+                # expected_hash: se il file è tornato allo stato indicizzato nel frattempo, l'upsert è un no-op
+                self.indexer.upsert_file(path, self.root_dir, verbose=True, expected_hash=stored_hash)
 
         except Exception as e:
             logger.error(f"Errore Watcher Upsert: {e}", exc_info=True)
@@ -1,3 +1,4 @@
+import os
 import threading
 from agno.knowledge.embedder.sentence_transformer import SentenceTransformerEmbedder
 
@@ -5,6 +6,9 @@ from agno.knowledge.embedder.sentence_transformer import SentenceTransformerEmbe
 _shared_embedder = None
 _embedder_lock = threading.Lock()
 
+# Testi per forward pass del modello: Jina v2 rende al meglio con batch 32-128
+EMBED_BATCH = int(os.environ.get("CRICKCODER_EMBED_BATCH", "64"))
+
 def get_shared_embedder() -> SentenceTransformerEmbedder:
     """
     Returns a shared singleton instance of the SentenceTransformerEmbedder.
@@ -18,9 +22,15 @@ def get_shared_embedder() -> SentenceTransformerEmbedder:
             if _shared_embedder is None:
                 # Use a standard, high-quality, lightweight code embedding model
                 # jina-embeddings-v2-base-code supports 8k context length
-                _shared_embedder = SentenceTransformerEmbedder(
+                embedder = SentenceTransformerEmbedder(
                     id="jinaai/jina-embeddings-v2-base-code",
                     dimensions=768
                 )
+                # Embedding batch (se la versione di Agno lo supporta): il vector db passa
+                # i documenti al modello a gruppi invece che uno per chiamata
+                if hasattr(embedder, "enable_batch") and hasattr(embedder, "batch_size"):
+                    embedder.enable_batch = True
+                    embedder.batch_size = EMBED_BATCH
+                _shared_embedder = embedder
                 
     return _shared_embedder
@@ -1,21 +1,37 @@
+import os
+import threading
 from src.core.storage.storage import TABLE_NAME
-from src.core.runtime.project_init import get_db_path
+from src.core.runtime.project_init import canonical_project_root, get_db_path
 from src.core.indexing.indexer_engine import UniversalCodeIndexer
 
 # Dizionario per memorizzare knowledge base per diversi progetti
 _knowledge_instances = {}
+_knowledge_lock = threading.Lock()
 
 def get_shared_knowledge(project_root: str = None):
     """Restituisce la knowledge base per il progetto specificato."""
     if project_root is None:
         # Usa la directory corrente come default
-        import os
         project_root = os.getcwd()
 
+    # Chiave canonica: "./proj" e "/abs/proj" condividono lo stesso indexer (e lo stesso DB)
+    project_root = canonical_project_root(project_root)
+
     if project_root not in _knowledge_instances:
-        print(f"Caricamento Knowledge Base per: {project_root}")
-        db_path = get_db_path(project_root)
-        indexer = UniversalCodeIndexer(db_path, TABLE_NAME)
-        _knowledge_instances[project_root] = indexer.knowledge
+        with _knowledge_lock:
+            # Double-check: i builder degli agenti possono chiamarla in parallelo
+            if project_root not in _knowledge_instances:
+                print(f"Caricamento Knowledge Base per: {project_root}")
+                db_path = get_db_path(project_root)
+                indexer = UniversalCodeIndexer(db_path, TABLE_NAME)
+                _knowledge_instances[project_root] = indexer.knowledge
+
+    return _knowledge_instances[project_root]
 
-    return _knowledge_instances[project_root]
\ No newline at end of file
+def invalidate_shared_knowledge(project_root: str = None) -> None:
+    """Rimuove dalla cache la knowledge base di un progetto (tutte se project_root è None)."""
+    with _knowledge_lock:
+        if project_root is None:
+            _knowledge_instances.clear()
+        else:
+            _knowledge_instances.pop(canonical_project_root(project_root), None)
@@ -0,0 +1,27 @@
+import os
+import threading
+from typing import Dict
+
+import lancedb
+
+# Una connessione LanceDB per URI (path canonico), condivisa da tool, server e indexer
+_connections: Dict[str, "lancedb.DBConnection"] = {}
+_connections_lock = threading.Lock()
+
+def get_lancedb_connection(uri: str) -> "lancedb.DBConnection":
+    """
+    Restituisce la connessione condivisa per uri (creata al primo uso).
+    "./db" e "/abs/db" puntano alla stessa connessione.
+    """
+    key = os.path.realpath(os.path.abspath(uri))
+    conn = _connections.get(key)
+
+    if conn is None:
+        with _connections_lock:
+            # Double-check locking pattern
+            conn = _connections.get(key)
+            if conn is None:
+                conn = lancedb.connect(key)
+                _connections[key] = conn
+
+    return conn
@@ -3,10 +3,12 @@ import sqlite3
 import uuid
 import time
 import logging
+import threading
 from typing import List, Dict, Optional, Any
 from agno.db.sqlite import SqliteDb
 from agno.db.sqlite import AsyncSqliteDb
 from src import BASE_DIR
+from src.core.runtime.project_init import canonical_project_root
 
 # LanceDB table name for project vectors
 TABLE_NAME = "project_vectors"
@@ -97,11 +99,31 @@ class AgentStorage(AsyncSqliteDb):
         except Exception as e:
              print(f"Error saving doc version: {e}")
 
+# Storage per progetto: evita di ricreare engine e schema a ogni richiesta
+_storage_instances: Dict[Optional[str], "AgentStorage"] = {}
+_storage_lock = threading.Lock()
+
 def get_agent_storage(project_root: str = None):
     """
     Restituisce l'oggetto Storage configurato su SQLite.
     I dati persistono nel file 'agent_memory.db' nella directory appropriata.
     """
+    # Chiave canonica, come la knowledge base condivisa
+    key = canonical_project_root(project_root) if project_root else None
+    storage = _storage_instances.get(key)
+    if storage is not None and os.path.exists(storage.db_file_path):
+        return storage
+
+    with _storage_lock:
+        # Double-check: i builder degli agenti possono chiamarla in parallelo
+        storage = _storage_instances.get(key)
+        if storage is not None and os.path.exists(storage.db_file_path):
+            return storage
+        storage = _create_agent_storage(project_root)
+        _storage_instances[key] = storage
+        return storage
+
+def _create_agent_storage(project_root: Optional[str]) -> "AgentStorage":
     db_file = get_agent_db_path(project_root)
     
     # Init Schema
@@ -126,6 +148,14 @@ def get_agent_storage(project_root: str = None):
         db_file=db_file,
     )
 
+def invalidate_agent_storage(project_root: str = None, all_projects: bool = False) -> None:
+    """Rimuove dalla cache lo storage di un progetto (o di tutti con all_projects=True)."""
+    with _storage_lock:
+        if all_projects:
+            _storage_instances.clear()
+        else:
+            _storage_instances.pop(canonical_project_root(project_root) if project_root else None, None)
+
 async def list_sessions_with_summary(project_root: str = None, limit: int = 50) -> List[Dict[str, Any]]:
     """
     Restituisce la lista delle sessioni con informazioni di riepilogo.
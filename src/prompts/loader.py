@@ -3,7 +3,24 @@ Prompt loading utilities for Crick.
 """
 import os
 import sys
+from functools import lru_cache
 
+def _resolve_prompts_dir() -> str:
+    if getattr(sys, 'frozen', False):
+        # Running in PyInstaller bundle
+        # In --onedir mode, assets are usually in _internal/src/prompts if mapped there
+        # but sys._MEIPASS usually points to _internal.
+        # We mapped 'src/prompts' -> 'src/prompts' in spec, so it should be at _MEIPASS/src/prompts
+        if hasattr(sys, '_MEIPASS'):
+            return os.path.join(sys._MEIPASS, 'src', 'prompts')
+        # Fallback, though _MEIPASS should exist
+        return os.path.join(os.path.dirname(sys.executable), 'src', 'prompts')
+    return os.path.dirname(__file__)
+
+# Resolved once: the bundle layout doesn't change at runtime
+PROMPTS_DIR = _resolve_prompts_dir()
+
+@lru_cache(maxsize=64)
 def load_prompt(filename: str, model_id: str = None) -> str:
     """
     Load a prompt file from the prompts directory, with model-specific fallback.
@@ -19,19 +36,11 @@ def load_prompt(filename: str, model_id: str = None) -> str:
 
     Returns:
         Content of the prompt file as string.
+
+    Prompts are bundled read-only assets, so results are memoized per (filename, model_id).
+    In dev, call load_prompt.cache_clear() after editing a prompt to pick up the change.
     """
-    if getattr(sys, 'frozen', False):
-        # Running in PyInstaller bundle
-        # In --onedir mode, assets are usually in _internal/src/prompts if mapped there
-        # but sys._MEIPASS usually points to _internal.
-        # We mapped 'src/prompts' -> 'src/prompts' in spec, so it should be at _MEIPASS/src/prompts
-        if hasattr(sys, '_MEIPASS'):
-            prompts_dir = os.path.join(sys._MEIPASS, 'src', 'prompts')
-        else:
-             # Fallback, though _MEIPASS should exist
-             prompts_dir = os.path.join(os.path.dirname(sys.executable), 'src', 'prompts')
-    else:
-        prompts_dir = os.path.dirname(__file__)
+    prompts_dir = PROMPTS_DIR
     
     # 1. Try Model-Specific Path
     if model_id:
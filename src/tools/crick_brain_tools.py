@@ -3,7 +3,7 @@ from typing import Optional
 from agno.tools import Toolkit
 from agno.agent import Agent
 from src.core.storage.storage import get_agent_storage
-from src.core.config.factory_models import build_model_for_runtime
+from src.core.config.factory_models import build_model_for_runtime, prepare_model_config
 from src.models import LLMSettings
 from src.prompts.loader import load_prompt
 from src.core.runtime.monitor import codebase_registry
@@ -56,13 +56,7 @@ class CrickBrainTools(Toolkit):
                  f.write("")
 
         # Build a lightweight model for this specifc task
-        model = build_model_for_runtime(
-            provider=self.llm_settings.provider,
-            model_id=self.llm_settings.model_id,
-            temperature=0.1, # Low temp for precise formatting
-            api_key=self.llm_settings.api_key,
-            base_url=self.llm_settings.base_url
-        )
+        model = build_model_for_runtime(*prepare_model_config(self.llm_settings, temperature=0.1)) # Low temp for precise formatting
 
         # Specialized System Prompt based on Doc Type
         if doc_type == "task.md":
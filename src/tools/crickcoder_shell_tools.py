@@ -1,12 +1,11 @@
 import subprocess
-import platform
 import logging
 import os
 import signal
 from pathlib import Path
 from typing import Optional, Union, List
 from agno.tools import Toolkit 
-from src.core.runtime.shell_manager import ShellManager
+from src.core.runtime.shell_manager import ShellManager, IS_WINDOWS
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +28,7 @@ class CrickCoderShellTools(Toolkit):
         
         self.base_dir = Path(base_dir).resolve() if base_dir else Path.cwd()
         self.timeout = timeout_seconds
-        self.is_windows = platform.system() == "Windows"
+        self.is_windows = IS_WINDOWS
         self.session_id = session_id
         
         # Tools registration
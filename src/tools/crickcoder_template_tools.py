@@ -1,13 +1,13 @@
 import os
 import shutil
-import lancedb
 from typing import Optional, List, Dict, Any
 from agno.tools import Toolkit
 from agno.vectordb.lancedb import LanceDb, SearchType
 from agno.agent import Agent
 from src.core.storage.embedder import get_shared_embedder
+from src.core.storage.lance_connections import get_lancedb_connection
 from src.models import LLMSettings
-from src.core.config.factory_models import build_model_for_runtime
+from src.core.config.factory_models import build_model_for_runtime, prepare_model_config
 from src.prompts.loader import load_prompt
 
 class CrickCoderTemplateTools(Toolkit):
@@ -153,13 +153,7 @@ class CrickCoderTemplateTools(Toolkit):
             if not self.llm_settings:
                  return "Error: LLM Settings required for Smart Adaptation."
 
-            model = build_model_for_runtime(
-                 provider=self.llm_settings.provider,
-                 model_id=self.llm_settings.model_id,
-                 temperature=0.1,
-                 api_key=self.llm_settings.api_key,
-                 base_url=self.llm_settings.base_url
-            )
+            model = build_model_for_runtime(*prepare_model_config(self.llm_settings, temperature=0.1))
             
             adapter_agent = Agent(
                 model=model,
@@ -223,7 +217,7 @@ class CrickCoderTemplateTools(Toolkit):
             return "No templates installed."
 
         try:
-            db = lancedb.connect(self.db_path)
+            db = get_lancedb_connection(self.db_path)
             response = db.list_tables()
             table_names = getattr(response, 'tables', [])
             
@@ -289,7 +283,7 @@ class CrickCoderTemplateTools(Toolkit):
             return f"No templates installed (Database not found at {self.db_path})."
             
         try:
-            db = lancedb.connect(self.db_path)
+            db = get_lancedb_connection(self.db_path)
             # list_tables() returns a response object with .tables attribute
             response = db.list_tables()
             
@@ -0,0 +1,72 @@
+import random
+import re
+
+from src.core.runtime.server_utils import unified_diff_text
+
+_HUNK_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+def apply_unified_diff(old_text: str, diff_text: str) -> str:
+    """Minimal unified-diff applier: checks every context/removed line against old_text."""
+    old_lines = old_text.splitlines(keepends=True)
+    diff_lines = diff_text.splitlines(keepends=True)
+    out = []
+    pos = 0  # next unconsumed index in old_lines
+    i = 0
+    while i < len(diff_lines):
+        match = _HUNK_RE.match(diff_lines[i])
+        i += 1
+        if not match:
+            continue
+        old_start, old_len = int(match.group(1)), int(match.group(2) or 1)
+        # difflib reports an empty old range as "start,0" with start = line before the hunk
+        hunk_start = old_start if old_len == 0 else old_start - 1
+        assert hunk_start >= pos
+        out.extend(old_lines[pos:hunk_start])
+        pos = hunk_start
+        while i < len(diff_lines) and not diff_lines[i].startswith("@@"):
+            line = diff_lines[i]
+            i += 1
+            tag, body = line[0], line[1:]
+            if tag == " ":
+                assert old_lines[pos] == body
+                out.append(body)
+                pos += 1
+            elif tag == "-":
+                assert old_lines[pos] == body
+                pos += 1
+            elif tag == "+":
+                out.append(body)
+            # "\ No newline at end of file" markers don't occur: every line keeps its ending
+    out.extend(old_lines[pos:])
+    return "".join(out)
+
+
+def test_unified_diff_repeated_lines_applies():
+    old, new = "a\na\na\na\na\n", "b\na\na\na\na\n"
+    diff = unified_diff_text(old, new, "a/f", "b/f")
+    assert apply_unified_diff(old, diff) == new
+
+
+def test_unified_diff_identical_texts_is_empty():
+    assert unified_diff_text("x\ny\n", "x\ny\n", "a/f", "b/f") == ""
+
+
+def test_unified_diff_random_edits_apply():
+    rng = random.Random(1234)
+    alphabet = ["a\n", "b\n", "c\n", "d\n"]
+    for _ in range(2000):
+        old_lines = [rng.choice(alphabet) for _ in range(rng.randint(0, 30))]
+        new_lines = list(old_lines)
+        for _ in range(rng.randint(1, 4)):
+            op = rng.random()
+            at = rng.randint(0, len(new_lines))
+            if op < 0.4 or not new_lines:
+                new_lines.insert(at, rng.choice(alphabet))
+            elif op < 0.7:
+                del new_lines[min(at, len(new_lines) - 1)]
+            else:
+                new_lines[min(at, len(new_lines) - 1)] = rng.choice(alphabet)
+        old, new = "".join(old_lines), "".join(new_lines)
+        diff = unified_diff_text(old, new, "a/f", "b/f")
+        assert apply_unified_diff(old, diff) == new